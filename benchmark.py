@@ -0,0 +1,327 @@
+"""
+TimeTrap – Offline replay benchmark
+Author: Anupom Kumar Ghosh
+Copyright © 2025 Anupom Kumar Ghosh
+
+Feeds recorded footage (a video file or a folder of frames) through the
+same check_for_face / run decision path as live monitoring, with the lock
+and sound actions stubbed out, and reports per-stage latency, sustained
+throughput and the time from the user leaving to the lock firing.
+
+Usage:
+    python3 benchmark.py recording.mp4 --leave-at 42 --output results.json
+    python3 benchmark.py frames/ --tolerance 0.5 --width 640 --height 480
+    python3 benchmark.py recording.mp4 --baseline results.json
+    python3 benchmark.py recording.mp4 --detectors haar,lbp,dnn,hog,cnn
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from main import (TimeTrap, TimeTrapSettings, Instrumentation, open_frame_source,
+                  create_detector)
+
+
+class ReplayTimeTrap(TimeTrap):
+    """TimeTrap driven by media time, with lock, sound and logging stubbed out"""
+
+    def __init__(self, settings_manager):
+        super().__init__(settings_manager)
+        self.locks = []
+
+    def log_event(self, message, event='info', **fields):
+        pass
+
+    def play_sound(self, sound_type='alert'):
+        pass
+
+    def lock_system(self):
+        self.locks.append(self.clock())
+
+
+class StridedSource:
+    """Hands out one frame per check_interval of media time"""
+
+    def __init__(self, source, interval):
+        self.source = source
+        self.interval = interval
+        self._next_check = 0.0
+
+    @property
+    def exhausted(self):
+        return self.source.exhausted
+
+    @property
+    def media_time(self):
+        return self.source.media_time
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def read(self):
+        while True:
+            ret, frame = self.source.read()
+            if not ret or self.source.media_time >= self._next_check:
+                self._next_check = self.source.media_time + self.interval
+                return ret, frame
+
+    def release(self):
+        self.source.release()
+
+
+def build_settings(args):
+    """Default settings (or the saved file) with command-line overrides applied"""
+    settings_manager = TimeTrapSettings()
+    if not args.saved_settings:
+        settings_manager.settings = settings_manager.default_settings.copy()
+    config = settings_manager.settings
+    config["frame_source"] = args.source
+    config["pipeline_workers"] = 0
+    config["lock_backend"] = "none"
+    config["log_enabled"] = False
+    if args.tolerance is not None:
+        config["tolerance"] = args.tolerance
+    if args.lock_delay is not None:
+        config["lock_delay"] = args.lock_delay
+    if args.width and args.height:
+        config["frame_width"], config["frame_height"] = args.width, args.height
+    if args.model:
+        config["detector_model"] = args.model
+    for override in args.set:
+        key, _, value = override.partition("=")
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+    return settings_manager
+
+
+def run_benchmark(settings_manager, check_interval=0.0, leave_at=None, quiet=True):
+    """Replay the configured source once and return machine-readable results"""
+    config = settings_manager.settings
+    trap = ReplayTimeTrap(settings_manager)
+    if not trap.load_authorized_user():
+        print("⚠️  No authorized user enrolled - every face will count as unauthorized")
+
+    source = open_frame_source(config["frame_source"],
+                               width=config["frame_width"],
+                               height=config["frame_height"],
+                               threaded=False, paced=False)
+    if not source.isOpened():
+        raise SystemExit(f"❌ Could not open {config['frame_source']}")
+    trap.camera = StridedSource(source, check_interval)
+    trap.clock = lambda: source.media_time
+    # Keep every sample so percentiles cover the whole run
+    trap.metrics = Instrumentation(window=10 ** 7)
+
+    verdicts = Counter()
+    absent_detected = []
+    quiet_output = open(os.devnull, 'w') if quiet else sys.stdout
+    started = time.perf_counter()
+    try:
+        while True:
+            with trap.metrics.stage('check'):
+                status = trap.check_for_face()
+            if trap.stream_finished:
+                break
+            if status is None:
+                verdicts['no_verdict'] += 1
+                continue
+            verdicts[status] += 1
+            was_absent = trap.user_absent_since is not None
+            with contextlib.redirect_stdout(quiet_output):
+                trap.handle_status(status)
+            if not was_absent and trap.user_absent_since is not None:
+                absent_detected.append(trap.user_absent_since)
+    finally:
+        wall_time = time.perf_counter() - started
+        trap.camera.release()
+        if quiet:
+            quiet_output.close()
+
+    checks = sum(verdicts.values())
+    results = {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "config": {key: config[key] for key in (
+            "frame_source", "frame_width", "frame_height", "tolerance", "lock_delay",
+            "detector_model", "detect_scale", "tracking_enabled", "motion_gate_enabled",
+            "identity_cache_enabled", "gallery_quantization", "two_tier_detection",
+            "presence_detector", "reverify_interval")},
+        "check_interval": check_interval,
+        "frames_decoded": source.frames_read,
+        "media_seconds": source.media_time,
+        "checks": checks,
+        "wall_seconds": wall_time,
+        "checks_per_second": checks / wall_time if wall_time else 0.0,
+        "realtime_factor": source.media_time / wall_time if wall_time else 0.0,
+        "verdicts": dict(verdicts),
+        "locks": trap.locks,
+        "counters": trap.component_counters(),
+        "stages": trap.metrics.summary(),
+    }
+    if leave_at is not None:
+        later_absent = [t for t in absent_detected if t >= leave_at]
+        later_locks = [t for t in trap.locks if t >= leave_at]
+        results["leave_at"] = leave_at
+        results["leave_to_absent_seconds"] = later_absent[0] - leave_at if later_absent else None
+        results["leave_to_lock_seconds"] = later_locks[0] - leave_at if later_locks else None
+    return results
+
+
+def benchmark_detectors(settings_manager, names, scale=1.0, max_frames=300):
+    """Time each detector backend on the same decoded frames"""
+    config = settings_manager.settings
+    source = open_frame_source(config["frame_source"],
+                               width=config["frame_width"],
+                               height=config["frame_height"],
+                               threaded=False, paced=False)
+    if not source.isOpened():
+        raise SystemExit(f"❌ Could not open {config['frame_source']}")
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = source.read()
+        if not ret:
+            if source.exhausted:
+                break
+            continue
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    source.release()
+
+    results, presence = {}, {}
+    for name in names:
+        try:
+            detector = create_detector(name, scale, config)
+        except (ValueError, cv2.error) as e:
+            results[name] = {"error": str(e)}
+            continue
+        timings, found = [], []
+        for frame in frames:
+            started = time.perf_counter()
+            boxes = detector.detect(frame)
+            timings.append(time.perf_counter() - started)
+            found.append(bool(boxes))
+        ms = np.asarray(timings) * 1000.0
+        presence[name] = np.asarray(found)
+        results[name] = {
+            "frames": len(frames),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p90_ms": float(np.percentile(ms, 90)),
+            "detections_per_second": 1000.0 / float(ms.mean()) if len(ms) else 0.0,
+            "face_rate": float(presence[name].mean()) if len(frames) else 0.0,
+        }
+    # Presence agreement with dlib HOG, the detector the identity path used to rely on
+    if "hog" in presence:
+        for name, found in presence.items():
+            results[name]["agreement_with_hog"] = float((found == presence["hog"]).mean())
+    return results
+
+
+def print_detector_report(results, scale):
+    """Per-backend latency and presence table"""
+    print("\n" + "="*60)
+    print(f"TIME TRAP - DETECTOR BACKENDS (scale {scale})")
+    print("="*60)
+    print(f"{'backend':<8}{'p50 ms':>9}{'p90 ms':>9}{'det/s':>9}{'faces':>8}{'vs hog':>8}")
+    for name, stats in results.items():
+        if "error" in stats:
+            print(f"{name:<8}  unavailable: {stats['error']}")
+            continue
+        agreement = stats.get("agreement_with_hog")
+        print(f"{name:<8}{stats['p50_ms']:>9.2f}{stats['p90_ms']:>9.2f}"
+              f"{stats['detections_per_second']:>9.1f}{stats['face_rate']:>8.0%}"
+              f"{'' if agreement is None else f'{agreement:.0%}':>8}")
+    print("="*60)
+
+
+def print_report(results, baseline=None):
+    """Human-readable summary, with percentage changes against a baseline run"""
+    def change(new, old):
+        if baseline is None or not old:
+            return ""
+        return f"  ({(new - old) / old:+.1%})"
+
+    print("\n" + "="*60)
+    print("TIME TRAP - REPLAY BENCHMARK")
+    print("="*60)
+    print(f"🎞️  Source: {results['config']['frame_source']}")
+    print(f"📊 {results['checks']} checks over {results['media_seconds']:.1f}s of footage "
+          f"in {results['wall_seconds']:.1f}s")
+    print(f"⚡ {results['checks_per_second']:.1f} checks/s sustained"
+          + change(results['checks_per_second'], baseline and baseline.get('checks_per_second')))
+    print(f"🧮 Verdicts: {results['verdicts']}")
+    print(f"\n{'stage':<10}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for name, stats in sorted(results['stages'].items()):
+        old = baseline and baseline.get('stages', {}).get(name, {}).get('p90_ms')
+        print(f"{name:<10}{stats['count']:>8}{stats['p50_ms']:>10.2f}"
+              f"{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}{change(stats['p90_ms'], old)}")
+    if "leave_at" in results:
+        absent, lock = results['leave_to_absent_seconds'], results['leave_to_lock_seconds']
+        print(f"\n🚶 Leave → absence detected: {'n/a' if absent is None else f'{absent:.2f}s'}")
+        print(f"🔒 Leave → lock: {'n/a' if lock is None else f'{lock:.2f}s'}")
+    print("="*60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded footage through Time Trap")
+    parser.add_argument("source", help="Video file, image folder or 'synthetic:<frames>'")
+    parser.add_argument("--leave-at", type=float,
+                        help="Media time (s) at which the user leaves, to measure time-to-lock")
+    parser.add_argument("--check-interval", type=float, default=0.0,
+                        help="Media seconds between checks (default: every frame)")
+    parser.add_argument("--tolerance", type=float)
+    parser.add_argument("--lock-delay", type=float)
+    parser.add_argument("--width", type=int, default=0)
+    parser.add_argument("--height", type=int, default=0)
+    parser.add_argument("--model", choices=["hog", "cnn"], help="dlib face detector model")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override any setting (value parsed as JSON when possible)")
+    parser.add_argument("--saved-settings", action="store_true",
+                        help="Start from timetrap_settings.json instead of the defaults")
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show monitoring messages")
+    parser.add_argument("--detectors", help="Compare detector backends instead, e.g. haar,dnn,hog")
+    parser.add_argument("--detect-scale", type=float, default=0.5,
+                        help="Downscale factor for --detectors")
+    parser.add_argument("--max-frames", type=int, default=300,
+                        help="Frames to time each backend on with --detectors")
+    args = parser.parse_args()
+
+    if args.detectors:
+        results = benchmark_detectors(build_settings(args), args.detectors.split(","),
+                                      args.detect_scale, args.max_frames)
+        print_detector_report(results, args.detect_scale)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({"detectors": results}, f, indent=4)
+            print(f"💾 Results written to {args.output}")
+        return
+
+    results = run_benchmark(build_settings(args), check_interval=args.check_interval,
+                            leave_at=args.leave_at, quiet=not args.verbose)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
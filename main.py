@@ -15,18 +15,65 @@ or when an unauthorized user is detected.
 
 """
 
-import cv2
-import face_recognition
-import numpy as np
 import time
 import subprocess
 import os
 import pickle
+import getpass
 import json
+import atexit
 from datetime import datetime
 import sys
-import tkinter as tk
-from tkinter import ttk, messagebox
+import glob
+import argparse
+import threading
+import queue
+import collections
+import concurrent.futures
+import contextlib
+import bisect
+import importlib
+import signal
+import struct
+import zlib
+
+_PROCESS_STARTED = time.perf_counter()
+
+# Import durations of the heavy modules, filled in as they are first used
+IMPORT_TIMES = {}
+
+
+class _LazyModule:
+    """
+    Stand-in for a heavy module that imports it on first attribute access
+
+    Once loaded, the real module replaces the stand-in in this module's
+    globals, so later lookups cost nothing extra.
+    """
+    
+    _lock = threading.Lock()
+    
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+        self._module = None
+    
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                started = time.perf_counter()
+                self._module = importlib.import_module(self._name)
+                IMPORT_TIMES[self._name] = time.perf_counter() - started
+                globals()[self._alias] = self._module
+        return self._module
+    
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+cv2 = _LazyModule("cv2", "cv2")
+face_recognition = _LazyModule("face_recognition", "face_recognition")
+np = _LazyModule("numpy", "np")
 
 class TimeTrapSettings:
     """Settings manager with GUI"""
@@ -39,27 +86,180 @@ class TimeTrapSettings:
             "tolerance": 0.6,
             "sound_enabled": True,
             "log_enabled": True,
-            "auto_start": False
+            "auto_start": False,
+            "frame_source": 0,
+            "frame_width": 0,
+            "frame_height": 0,
+            "frame_fps": 0,
+            "buffer_size": 1,
+            "threaded_capture": True,
+            "tracking_enabled": True,
+            "detect_scale": 0.5,
+            "redetect_interval": 10,
+            "roi_margin": 0.5,
+            "motion_gate_enabled": True,
+            "motion_threshold": 3.0,
+            "max_verdict_age": 5.0,
+            "gallery_quantization": "none",
+            "identity_cache_enabled": True,
+            "identity_cache_ttl": 3.0,
+            "identity_cache_iou": 0.6,
+            "identity_cache_drift": 0.25,
+            "adaptive_sampling": True,
+            "sampling_intervals": {
+                "stable": [0.5, 3.0],
+                "countdown": [0.25, 1.0],
+                "returned": [0.2, 0.5],
+                "suspect": [0.1, 0.2]
+            },
+            "sampling_backoff": 1.5,
+            "returned_window": 10.0,
+            "suspect_margin": 0.05,
+            "pipeline_workers": 0,
+            "pipeline_queue_size": 2,
+            "detector_model": "hog",
+            "stats_enabled": True,
+            "stats_file": "timetrap_stats",
+            "stats_export_format": "json",
+            "stats_export_interval": 10.0,
+            "lock_backend": "auto",
+            "action_debounce": 3.0,
+            "log_max_bytes": 5000000,
+            "log_rotate_daily": True,
+            "log_backups": 5,
+            "enroll_preview_scale": 0.25,
+            "enroll_detect_every": 3,
+            "enroll_burst_frames": 12,
+            "enroll_burst_seconds": 6.0,
+            "enroll_min_samples": 4,
+            "enroll_exemplars": 5,
+            "enroll_blur_threshold": 60.0,
+            "enroll_duplicate_distance": 0.08,
+            "record_sessions": False,
+            "session_dir": "sessions",
+            "model_warmup": True,
+            "two_tier_detection": True,
+            "presence_detector": "haar",
+            "presence_scale": 0.5,
+            "reverify_interval": 2.0,
+            "detector_cascade_path": "",
+            "dnn_model_path": "models/res10_300x300_ssd_iter_140000.caffemodel",
+            "dnn_config_path": "models/deploy.prototxt",
+            "dnn_confidence": 0.5,
+            "settings_hot_reload": True,
+            "settings_poll_interval": 1.0,
+            "quality_gate_enabled": True,
+            "quality_min_face_size": 60,
+            "quality_min_brightness": 40,
+            "quality_max_brightness": 225,
+            "quality_min_sharpness": 30.0,
+            "quality_max_yaw": 0.35,
+            "quality_check_pose": True,
+            "quality_max_deferrals": 5,
+            "identity_early_exit": True,
+            "identity_fast_model": "small",
+            "identity_fast_jitters": 1,
+            "identity_confirm_model": "large",
+            "identity_confirm_jitters": 3,
+            "flight_recorder_enabled": True,
+            "flight_recorder_size": 120,
+            "incident_dir": "incidents"
         }
         self.settings = self.load_settings()
     
     def load_settings(self):
         """Load settings from file or create defaults"""
+        settings = self.default_settings.copy()
         if os.path.exists(self.settings_file):
             try:
                 with open(self.settings_file, 'r') as f:
-                    return json.load(f)
+                    # Fill in keys added since the file was written
+                    settings.update(json.load(f))
             except:
                 return self.default_settings.copy()
-        return self.default_settings.copy()
+        return settings
     
     def save_settings(self):
         """Save settings to file"""
-        with open(self.settings_file, 'w') as f:
+        # Write and rename, so a running monitor never reads a half-written file
+        temp_file = self.settings_file + ".tmp"
+        with open(temp_file, 'w') as f:
             json.dump(self.settings, f, indent=4)
+        os.replace(temp_file, self.settings_file)
+    
+    # Allowed values for settings that pick an implementation
+    choices = {
+        "detector_model": ("hog", "cnn"),
+        "presence_detector": ("haar", "lbp", "dnn", "hog", "cnn"),
+        "gallery_quantization": ("none", "float16", "int8"),
+        "stats_export_format": ("json", "prometheus", "both"),
+        "lock_backend": ("auto", "macos", "linux", "none"),
+        "identity_fast_model": ("small", "large"),
+        "identity_confirm_model": ("small", "large"),
+    }
+    
+    # Inclusive bounds for numeric settings
+    limits = {
+        "lock_delay": (1, 3600),
+        "check_interval": (0.01, 60),
+        "tolerance": (0.1, 1.0),
+        "detect_scale": (0.05, 1.0),
+        "presence_scale": (0.05, 1.0),
+        "redetect_interval": (1, 10000),
+        "roi_margin": (0, 5),
+        "motion_threshold": (0, 255),
+        "identity_cache_iou": (0, 1),
+        "sampling_backoff": (1, 10),
+        "dnn_confidence": (0, 1),
+        "stats_export_interval": (0.1, 86400),
+        "settings_poll_interval": (0.1, 3600),
+        "quality_min_brightness": (0, 255),
+        "quality_max_brightness": (0, 255),
+        "quality_max_yaw": (0, 5),
+        "identity_fast_jitters": (1, 100),
+        "identity_confirm_jitters": (1, 100),
+        "flight_recorder_size": (1, 100000),
+    }
+    
+    def validate(self, settings):
+        """Reasons the settings cannot be used; an empty list means they are fine"""
+        problems = []
+        for key, default in self.default_settings.items():
+            value = settings.get(key, default)
+            if key == "frame_source":
+                if not isinstance(value, (int, str)) or isinstance(value, bool):
+                    problems.append(f"{key} must be a camera index or a path")
+                continue
+            if isinstance(default, bool) or not isinstance(default, (int, float)):
+                if not isinstance(value, type(default)):
+                    problems.append(f"{key} must be {type(default).__name__}")
+                    continue
+            elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                problems.append(f"{key} must be a number")
+                continue
+            elif value < 0:
+                problems.append(f"{key} must not be negative")
+            if key in self.limits and not self.limits[key][0] <= value <= self.limits[key][1]:
+                problems.append(f"{key} must be between {self.limits[key][0]} "
+                                f"and {self.limits[key][1]}")
+            if key in self.choices and value not in self.choices[key]:
+                problems.append(f"{key} must be one of {', '.join(self.choices[key])}")
+        intervals = settings.get("sampling_intervals", {})
+        if isinstance(intervals, dict):
+            for state in AdaptiveScheduler.states:
+                pair = intervals.get(state)
+                if (not isinstance(pair, list) or len(pair) != 2 or
+                        any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in pair)
+                        or not 0 < pair[0] <= pair[1]):
+                    problems.append(f"sampling_intervals.{state} must be "
+                                    f"[fastest, slowest] with 0 < fastest <= slowest")
+        return problems
     
     def show_settings_window(self, callback=None):
         """Display settings GUI window"""
+        import tkinter as tk
+        from tkinter import ttk, messagebox
+        
         window = tk.Tk()
         window.title("Time Trap Settings")
         window.geometry("600x520")
@@ -207,7 +407,8 @@ class TimeTrapSettings:
             
             messagebox.showinfo("Settings Saved", 
                               "Your settings have been saved successfully!\n\n" +
-                              "Restart Time Trap for changes to take effect.")
+                              "A running Time Trap applies them within a second. "
+                              "Camera and worker settings apply on restart.")
             
             if callback:
                 callback(self.settings)
@@ -247,312 +448,3766 @@ class TimeTrapSettings:
         window.mainloop()
 
 
-class TimeTrap:
-    def __init__(self, settings_manager):
-        """
-        Initialize Time Trap security system with settings
-        """
+class SettingsWatcher:
+    """
+    Notices when the settings file changes while Time Trap is running
+    
+    poll() costs a single os.stat() at most every poll_interval seconds; the
+    file is only read when its modification time or size changed. Settings
+    that fail to parse or validate are reported once and ignored until the
+    file changes again.
+    """
+    
+    def __init__(self, settings_manager, poll_interval=1.0):
         self.settings = settings_manager
-        config = self.settings.settings
-        
-        self.lock_delay = config["lock_delay"]
-        self.check_interval = config["check_interval"]
-        self.tolerance = config["tolerance"]
-        self.sound_enabled = config["sound_enabled"]
-        self.log_enabled = config["log_enabled"]
-        
-        self.authorized_face_encoding = None
-        self.user_absent_since = None
-        self.camera = None
-        self.running = False
-        self.encoding_file = "authorized_user.pkl"
-        self.log_file = "timetrap_activity.log"
+        self.poll_interval = poll_interval
+        self._next_poll = 0.0
+        self._signature = self._stat()
     
-    def log_event(self, message):
-        """Log events to file if logging is enabled"""
-        if self.log_enabled:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            with open(self.log_file, 'a') as f:
-                f.write(f"[{timestamp}] {message}\n")
+    def _stat(self):
+        try:
+            stat = os.stat(self.settings.settings_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
     
-    def play_sound(self, sound_type='alert'):
-        """Play system sound if sounds are enabled"""
-        if self.sound_enabled:
-            try:
-                if sound_type == 'alert':
-                    subprocess.run(['afplay', '/System/Library/Sounds/Sosumi.aiff'])
-                elif sound_type == 'lock':
-                    subprocess.run(['afplay', '/System/Library/Sounds/Glass.aiff'])
-            except:
-                pass
+    def poll(self, now=None):
+        """Validated settings if the file changed since the last poll, else None"""
+        now = time.monotonic() if now is None else now
+        if now < self._next_poll:
+            return None
+        self._next_poll = now + self.poll_interval
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return None
+        self._signature = signature
         
-    def lock_mac(self):
-        """Lock the macOS system"""
         try:
-            subprocess.run([
-                "osascript", "-e",
-                'tell application "System Events" to keystroke "q" using {control down, command down}'
-            ])
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] 🔒 System locked!")
-            self.log_event("System locked")
-            self.play_sound('lock')
-        except Exception as e:
-            print(f"Error locking system: {e}")
-            self.log_event(f"Error locking system: {e}")
+            with open(self.settings.settings_file, 'r') as f:
+                loaded = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring settings change - could not read it: {e}")
+            return None
+        config = self.settings.default_settings.copy()
+        config.update(loaded)
+        problems = self.settings.validate(config)
+        if problems:
+            print(f"⚠️  Ignoring settings change: {'; '.join(problems)}")
+            return None
+        return config
+
+
+class FrameBuffers:
+    """
+    Preallocated image buffers reused from frame to frame
     
-    def setup_authorized_user(self):
-        """Capture and save the authorized user's face"""
-        print("\n" + "="*60)
-        print("TIME TRAP - AUTHORIZED USER SETUP")
-        print("="*60)
-        print("\n📸 Starting camera for face registration...")
-        print("Please position your face clearly in front of the camera.")
-        print("Press SPACE when ready to capture your face.")
-        print("Press ESC to cancel.\n")
-        
-        self.camera = cv2.VideoCapture(0)
-        if not self.camera.isOpened():
-            print("❌ Error: Could not access camera!")
-            return False
-        
-        captured = False
-        while True:
-            ret, frame = self.camera.read()
+    Every name owns a ring of depth flat byte buffers. get() hands out the
+    next one reshaped to the requested shape (always C-contiguous, as dlib
+    needs) and only grows it when a larger frame arrives, so steady-state
+    monitoring allocates no frame-sized arrays. A buffer stays valid until
+    its name has been asked for depth more times.
+    """
+    
+    def __init__(self, depth=2):
+        self.depth = depth
+        self.allocations = 0
+        self.reuses = 0
+        self._rings = {}
+    
+    def get(self, name, shape, dtype='uint8'):
+        slots = self._rings.setdefault(name, [0] + [None] * self.depth)
+        index = slots[0] + 1
+        slots[0] = index % self.depth
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if slots[index] is None or slots[index].nbytes < nbytes:
+            slots[index] = np.empty(nbytes, dtype=np.uint8)
+            self.allocations += 1
+        else:
+            self.reuses += 1
+        return slots[index][:nbytes].view(dtype).reshape(shape)
+    
+    @property
+    def nbytes(self):
+        return sum(slot.nbytes for slots in self._rings.values()
+                   for slot in slots[1:] if slot is not None)
+    
+    def copy(self, image, name):
+        dst = self.get(name, image.shape, image.dtype)
+        np.copyto(dst, image)
+        return dst
+    
+    def convert(self, image, code, name, channels=3):
+        """cv2.cvtColor into a reused buffer"""
+        shape = image.shape[:2] + ((channels,) if channels > 1 else ())
+        return cv2.cvtColor(image, code, dst=self.get(name, shape, image.dtype))
+    
+    def resize(self, image, size, name, interpolation=None):
+        """cv2.resize to size (width, height) into a reused buffer"""
+        width, height = size
+        dst = self.get(name, (height, width) + image.shape[2:], image.dtype)
+        return cv2.resize(image, (width, height), dst=dst,
+                          interpolation=cv2.INTER_AREA if interpolation is None else interpolation)
+    
+    def scale(self, image, factor, name):
+        """Downscale by factor into a reused buffer"""
+        height, width = image.shape[:2]
+        size = (max(1, int(round(width * factor))), max(1, int(round(height * factor))))
+        return self.resize(image, size, name)
+
+
+def resident_memory_bytes():
+    """Current resident set size of this process (peak where /proc is missing)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class FrameSource:
+    """Common interface for everything TimeTrap can read frames from
+    
+    Sources mimic cv2.VideoCapture (read/isOpened/release) so the
+    monitoring loop does not care where frames come from. Frames are
+    decoded into reused buffers: a frame stays valid until the next read
+    after it, so copy it to keep it any longer.
+    """
+    
+    def __init__(self, fps=0, paced=False):
+        self.fps = fps
+        self.paced = paced
+        self.exhausted = False
+        self.frames_read = 0
+        self.buffers = FrameBuffers(depth=2)
+        self._frame_shape = None
+        self._next_frame_at = None
+    
+    @property
+    def media_time(self):
+        """Position in the stream in seconds (frames read / fps)"""
+        return self.frames_read / self.fps if self.fps else 0.0
+    
+    def isOpened(self):
+        return True
+    
+    def read(self):
+        raise NotImplementedError
+    
+    def release(self):
+        pass
+    
+    def _read_capture(self, capture):
+        """VideoCapture.read() into a reused buffer once the frame size is known"""
+        if self._frame_shape is None:
+            ret, frame = capture.read()
+        else:
+            ret, frame = capture.read(self.buffers.get('capture', self._frame_shape))
+        if ret:
+            self._frame_shape = frame.shape
+        return ret, frame
+    
+    def _pace(self):
+        """Sleep until the next frame is due when replaying at native speed"""
+        self.frames_read += 1
+        if not self.paced or not self.fps:
+            return
+        now = time.time()
+        if self._next_frame_at is None:
+            self._next_frame_at = now
+        delay = self._next_frame_at - now
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame_at = max(self._next_frame_at, now) + 1.0 / self.fps
+
+
+class CameraSource(FrameSource):
+    """Live camera opened through OpenCV"""
+    
+    def __init__(self, index=0, width=0, height=0, fps=0, buffer_size=1):
+        super().__init__(fps=fps)
+        self.capture = cv2.VideoCapture(index)
+        if width:
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.capture.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size:
+            # Keep the driver queue short so frames are not hundreds of ms old
+            self.capture.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or fps
+    
+    def isOpened(self):
+        return self.capture.isOpened()
+    
+    def read(self):
+        ret, frame = self._read_capture(self.capture)
+        if ret:
+            self.frames_read += 1
+        return ret, frame
+    
+    def release(self):
+        self.capture.release()
+
+
+class VideoFileSource(FrameSource):
+    """Recorded video file, optionally paced at its native frame rate"""
+    
+    def __init__(self, path, width=0, height=0, fps=0, paced=True, loop=False):
+        self.capture = cv2.VideoCapture(path)
+        native_fps = self.capture.get(cv2.CAP_PROP_FPS) or 30
+        super().__init__(fps=fps or native_fps, paced=paced)
+        self.size = (width, height) if width and height else None
+        self.loop = loop
+    
+    def isOpened(self):
+        return self.capture.isOpened()
+    
+    def read(self):
+        ret, frame = self._read_capture(self.capture)
+        if not ret and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._read_capture(self.capture)
+        if not ret:
+            self.exhausted = True
+            return False, None
+        if self.size:
+            frame = self.buffers.resize(frame, self.size, 'frame', cv2.INTER_LINEAR)
+        self._pace()
+        return True, frame
+    
+    def release(self):
+        self.capture.release()
+
+
+class ImageDirectorySource(FrameSource):
+    """Folder of still images played back in name order"""
+    
+    extensions = ('.jpg', '.jpeg', '.png', '.bmp')
+    
+    def __init__(self, path, width=0, height=0, fps=0, paced=True, loop=False):
+        super().__init__(fps=fps or 10, paced=paced)
+        self.files = sorted(f for f in glob.glob(os.path.join(path, '*'))
+                            if f.lower().endswith(self.extensions))
+        self.size = (width, height) if width and height else None
+        self.loop = loop
+        self.position = 0
+    
+    def isOpened(self):
+        return len(self.files) > 0
+    
+    def read(self):
+        if self.position >= len(self.files):
+            if not self.loop or not self.files:
+                self.exhausted = True
+                return False, None
+            self.position = 0
+        frame = cv2.imread(self.files[self.position])
+        self.position += 1
+        if frame is None:
+            return False, None
+        if self.size:
+            frame = self.buffers.resize(frame, self.size, 'frame', cv2.INTER_LINEAR)
+        self._pace()
+        return True, frame
+
+
+class SyntheticSource(FrameSource):
+    """Generated frames for running the loop without any camera or footage"""
+    
+    def __init__(self, width=0, height=0, fps=0, paced=True, frames=0):
+        super().__init__(fps=fps or 30, paced=paced)
+        self.width = width or 640
+        self.height = height or 480
+        self.max_frames = frames
+        # Static gradient background with a small square moving across it
+        row = np.linspace(40, 200, self.width, dtype=np.uint8)
+        self.background = np.repeat(np.tile(row, (self.height, 1))[:, :, None], 3, axis=2)
+    
+    def read(self):
+        if self.max_frames and self.frames_read >= self.max_frames:
+            self.exhausted = True
+            return False, None
+        frame = self.buffers.copy(self.background, 'frame')
+        size = max(8, self.height // 8)
+        x = (self.frames_read * 4) % max(1, self.width - size)
+        y = (self.height - size) // 2
+        frame[y:y + size, x:x + size] = 255
+        self._pace()
+        return True, frame
+
+
+class LatestFrameReader(FrameSource):
+    """Background capture thread that only ever keeps the newest frame
+    
+    OpenCV queues frames internally, so reading synchronously between sleeps
+    hands recognition a frame that is already stale. This thread drains the
+    source continuously and read() returns the most recent frame, waiting
+    for a new one if the caller is faster than the source.
+    """
+    
+    def __init__(self, source, timeout=1.0):
+        super().__init__(fps=source.fps)
+        self.source = source
+        self.timeout = timeout
+        self.dropped = 0
+        self.timestamp = None
+        self._frame = None
+        self._seq = 0
+        self._consumed = 0
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+    
+    @property
+    def media_time(self):
+        return self.source.media_time
+    
+    def isOpened(self):
+        return self.source.isOpened()
+    
+    def _capture_loop(self):
+        while not self._stopped:
+            ret, frame = self.source.read()
             if not ret:
-                print("❌ Failed to grab frame")
-                break
-            
-            # Flip frame for mirror effect
-            frame = cv2.flip(frame, 1)
-            
-            # Find faces in current frame
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_frame)
-            
-            # Draw rectangle around detected faces
-            for (top, right, bottom, left) in face_locations:
-                cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                cv2.putText(frame, "Face Detected", (left, top - 10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            # Display instructions
-            cv2.putText(frame, "Press SPACE to capture", (10, 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            cv2.putText(frame, "Press ESC to cancel", (10, 60),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            cv2.imshow("Time Trap - Setup", frame)
-            
-            key = cv2.waitKey(1) & 0xFF
-            if key == 27:  # ESC
-                print("\n❌ Setup cancelled")
-                break
-            elif key == 32 and len(face_locations) > 0:  # SPACE
-                print("\n📷 Capturing face...")
-                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-                if len(face_encodings) > 0:
-                    self.authorized_face_encoding = face_encodings[0]
-                    # Save encoding to file
-                    with open(self.encoding_file, 'wb') as f:
-                        pickle.dump(self.authorized_face_encoding, f)
-                    print("✅ Face captured and saved successfully!")
-                    self.log_event("Authorized user registered")
-                    captured = True
-                    time.sleep(1)
+                if self.source.exhausted:
                     break
-                else:
-                    print("❌ Could not encode face. Please try again.")
-            elif key == 32 and len(face_locations) == 0:
-                print("⚠️  No face detected. Please position yourself properly.")
-        
-        self.camera.release()
-        cv2.destroyAllWindows()
-        return captured
+                # Camera hiccup - back off briefly instead of spinning
+                time.sleep(0.01)
+                continue
+            with self._cond:
+                if self._seq > self._consumed:
+                    self.dropped += 1
+                self._frame = frame
+                self._seq += 1
+                self.timestamp = time.time()
+                self._cond.notify_all()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
     
-    def load_authorized_user(self):
-        """Load the authorized user's face encoding from file"""
-        if os.path.exists(self.encoding_file):
-            with open(self.encoding_file, 'rb') as f:
-                self.authorized_face_encoding = pickle.load(f)
-            print("✅ Authorized user profile loaded")
-            return True
-        return False
+    def read(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > self._consumed or self._stopped,
+                                self.timeout)
+            if self._seq <= self._consumed:
+                self.exhausted = self._stopped and self.source.exhausted
+                return False, None
+            self._consumed = self._seq
+            self.frames_read += 1
+            # The capture thread keeps decoding into the source's buffers, so
+            # the caller gets its own copy (into buffers reused in turn)
+            return True, self.buffers.copy(self._frame, 'frame')
     
-    def check_for_face(self):
-        """
-        Check camera for faces and determine if authorized user is present
-        
-        Returns:
-            'authorized' - Authorized user detected
-            'unauthorized' - Unknown person detected
-            'absent' - No person detected
-        """
-        ret, frame = self.camera.read()
-        if not ret:
-            return 'absent'
-        
-        # Convert to RGB for face_recognition
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Detect faces
-        face_locations = face_recognition.face_locations(rgb_frame)
-        
-        if len(face_locations) == 0:
-            return 'absent'
-        
-        # Get face encodings
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-        
-        for face_encoding in face_encodings:
-            # Compare with authorized user using configured tolerance
-            matches = face_recognition.compare_faces(
-                [self.authorized_face_encoding], face_encoding, tolerance=self.tolerance
-            )
-            
-            if matches[0]:
-                return 'authorized'
-        
-        return 'unauthorized'
+    def release(self):
+        self._stopped = True
+        self._thread.join(timeout=2)
+        self.source.release()
+
+
+def open_frame_source(spec=0, width=0, height=0, fps=0, buffer_size=1,
+                      threaded=True, paced=None, loop=False):
+    """
+    Open a frame source from a spec
     
-    def run(self):
-        """Main monitoring loop"""
-        print("\n" + "="*60)
-        print("TIME TRAP - ACTIVE MONITORING")
-        print("="*60)
-        print(f"⚙️  Lock delay: {self.lock_delay} seconds")
-        print(f"⚙️  Check interval: {self.check_interval} seconds")
-        print(f"⚙️  Face match tolerance: {self.tolerance}")
-        print(f"⚙️  Sound alerts: {'Enabled' if self.sound_enabled else 'Disabled'}")
-        print(f"⚙️  Activity logging: {'Enabled' if self.log_enabled else 'Disabled'}")
-        print("🟢 Monitoring started. Press Ctrl+C to stop.\n")
-        
-        self.log_event("Monitoring started")
-        
-        self.camera = cv2.VideoCapture(0)
-        if not self.camera.isOpened():
-            print("❌ Error: Could not access camera!")
-            return
-        
-        self.running = True
-        self.user_absent_since = None
-        
-        try:
-            while self.running:
-                status = self.check_for_face()
-                current_time = datetime.now().strftime('%H:%M:%S')
-                
-                if status == 'authorized':
-                    if self.user_absent_since is not None:
-                        print(f"[{current_time}] ✅ Authorized user returned")
-                        self.log_event("Authorized user returned")
-                    self.user_absent_since = None
-                    
-                elif status == 'absent':
-                    if self.user_absent_since is None:
-                        self.user_absent_since = time.time()
-                        print(f"[{current_time}] ⚠️  User absent - lock countdown started")
-                        self.log_event("User absent - countdown started")
-                        self.play_sound('alert')
-                    else:
-                        elapsed = time.time() - self.user_absent_since
-                        remaining = self.lock_delay - elapsed
-                        if remaining > 0:
-                            print(f"[{current_time}] ⏳ Locking in {int(remaining)} seconds...")
-                        else:
-                            print(f"[{current_time}] 🔒 Lock delay exceeded - locking system")
-                            self.lock_mac()
-                            self.user_absent_since = None
-                
-                elif status == 'unauthorized':
-                    print(f"[{current_time}] 🚨 UNAUTHORIZED USER DETECTED - LOCKING IMMEDIATELY")
-                    self.log_event("UNAUTHORIZED USER DETECTED - System locked")
-                    self.play_sound('alert')
-                    self.lock_mac()
-                    self.user_absent_since = None
-                
-                time.sleep(self.check_interval)
-                
-        except KeyboardInterrupt:
-            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] 🛑 Monitoring stopped by user")
-            self.log_event("Monitoring stopped by user")
-        finally:
-            self.camera.release()
-            print("👋 Time Trap shutdown complete")
+    spec may be a camera index, a video file, a folder of images or
+    'synthetic'. File sources are paced at their frame rate when threaded
+    so that recorded footage behaves like a live camera.
+    """
+    if paced is None:
+        paced = threaded
+    spec = str(spec).strip()
+    if spec.isdigit():
+        source = CameraSource(int(spec), width, height, fps, buffer_size)
+    elif spec.startswith('synthetic'):
+        frames = int(spec.split(':', 1)[1]) if ':' in spec else 0
+        source = SyntheticSource(width, height, fps, paced=paced, frames=frames)
+    elif os.path.isdir(spec):
+        source = ImageDirectorySource(spec, width, height, fps, paced=paced, loop=loop)
+    else:
+        source = VideoFileSource(spec, width, height, fps, paced=paced, loop=loop)
     
-    def start(self):
-        """Initialize and start Time Trap"""
-        print("\n" + "="*60)
-        print("  _____ ___ __  __ _____   _____ ____      _    ____  ")
-        print(" |_   _|_ _|  \\/  | ____| |_   _|  _ \\    / \\  |  _ \\ ")
-        print("   | |  | || |\\/| |  _|     | | | |_) |  / _ \\ | |_) |")
-        print("   | |  | || |  | | |___    | | |  _ <  / ___ \\|  __/ ")
-        print("   |_| |___|_|  |_|_____|   |_| |_| \\_\\/_/   \\_\\_|    ")
+    if threaded and source.isOpened():
+        return LatestFrameReader(source)
+    return source
 
-        print("    ")
-        print("                                          MADE BY REDEYES(ANUPOM)")
-        print("="*60)
-        print("Smart PC Lock System with Face Recognition")
-        print("="*60 + "\n")
-        
-        # Check if authorized user exists
-        if not self.load_authorized_user():
-            print("⚠️  No authorized user found. Starting setup...\n")
-            if not self.setup_authorized_user():
-                print("\n❌ Setup failed. Exiting.")
-                return
-        
-        print("\n✅ System ready!")
-        
-        # Check if auto-start is enabled
-        if self.settings.settings.get("auto_start", False):
-            print("🚀 Auto-start enabled. Starting monitoring in 3 seconds...")
-            time.sleep(3)
+
+def locate_faces(image, scale=1.0, model='hog', offset_x=0, offset_y=0, buffers=None):
+    """Run dlib on a downscaled copy of image and map boxes back to full size"""
+    if scale != 1.0:
+        if buffers is not None:
+            small = buffers.scale(image, scale, 'locate')
         else:
-            input("Press ENTER to start monitoring...")
-        
-        self.run()
+            small = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    elif buffers is not None and not image.flags.c_contiguous:
+        small = buffers.copy(image, 'locate')
+    else:
+        small = np.ascontiguousarray(image)
+    boxes = []
+    for (top, right, bottom, left) in face_recognition.face_locations(small, model=model):
+        boxes.append((int(top / scale) + offset_y, int(right / scale) + offset_x,
+                      int(bottom / scale) + offset_y, int(left / scale) + offset_x))
+    return boxes
 
 
-def main():
+def rank_faces(boxes, frame_shape):
+    """Boxes ordered most-likely-the-user first: large faces near the centre"""
+    height, width = frame_shape[:2]
+    half_diagonal = max(1.0, (width ** 2 + height ** 2) ** 0.5 / 2)
+    
+    def score(box):
+        top, right, bottom, left = box
+        offset = (((left + right) / 2 - width / 2) ** 2 +
+                  ((top + bottom) / 2 - height / 2) ** 2) ** 0.5 / half_diagonal
+        return (bottom - top) * (right - left) / (1.0 + offset)
+    
+    return sorted(boxes, key=score, reverse=True)
 
-    """Main entry point"""
-    print("="*60)
-    print("TIME TRAP - STARTUP")
-    print("="*60)
+
+class FaceDetector:
+    """
+    Face detector backend
     
-    # Load settings
-    settings_manager = TimeTrapSettings()
+    detect() runs on a copy of the RGB frame downscaled by scale and returns
+    boxes (top, right, bottom, left) in full-resolution coordinates. Given
+    a BGR frame and color_code, it downscales first and converts only the
+    small copy.
+    """
     
-    print("\n1. Start Monitoring")
-    print("2. Re-register Face")
-    print("3. View Activity Log")
-    print("4. Exit")
+    name = 'base'
     
-    choice = input("\nSelect option (1-5): ").strip()
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.buffers = FrameBuffers(depth=1)
     
-   
-    if choice == "2":
-        # Force re-registration
-        time_trap = TimeTrap(settings_manager)
-        time_trap.setup_authorized_user()
-        return
-    elif choice == "3":
-        # View activity log
-        if os.path.exists("timetrap_activity.log"):
-            print("\n" + "="*60)
-            print("ACTIVITY LOG")
-            print("="*60 + "\n")
-            with open("timetrap_activity.log", 'r') as f:
-                print(f.read())
-            print("\n" + "="*60)
-            input("\nPress ENTER to continue...")
-        else:
-            print("\n⚠️  No activity log found. Enable logging in settings.")
-            time.sleep(2)
-        return
-    elif choice == "4":
-        print("👋 Goodbye!")
-        return
+    def detect(self, frame, color_code=None):
+        small = frame if self.scale == 1.0 else self.buffers.scale(frame, self.scale, 'detect')
+        if color_code is not None:
+            small = self.buffers.convert(small, color_code, 'detect_rgb')
+        return [(int(top / self.scale), int(right / self.scale),
+                 int(bottom / self.scale), int(left / self.scale))
+                for (top, right, bottom, left) in self._detect(small)]
+    
+    def _detect(self, image):
+        raise NotImplementedError
+
+
+class DlibDetector(FaceDetector):
+    """dlib HOG or CNN detector through face_recognition - the identity path"""
+    
+    def __init__(self, scale=1.0, model='hog'):
+        super().__init__(scale)
+        self.model = model
+        self.name = model
+    
+    def _detect(self, image):
+        return face_recognition.face_locations(np.ascontiguousarray(image), model=self.model)
+
+
+class CascadeDetector(FaceDetector):
+    """
+    OpenCV Haar or LBP cascade - the cheapest presence check
+    
+    The Haar frontal face cascade ships with opencv-python; LBP cascades
+    do not, so 'lbp' needs detector_cascade_path.
+    """
+    
+    default_cascades = {'haar': 'haarcascade_frontalface_default.xml',
+                        'lbp': 'lbpcascade_frontalface_improved.xml'}
+    
+    def __init__(self, scale=1.0, kind='haar', cascade_path='', min_neighbors=5):
+        super().__init__(scale)
+        self.name = kind
+        if not hasattr(cv2, 'CascadeClassifier'):
+            # OpenCV 5 moved cascades out of the main package
+            raise ValueError(f"this OpenCV build ({cv2.__version__}) has no cascade classifier")
+        if not cascade_path:
+            cascade_path = os.path.join(getattr(cv2.data, 'haarcascades', ''),
+                                        self.default_cascades[kind])
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise ValueError(f"could not load {kind} cascade from {cascade_path}")
+        self.min_neighbors = min_neighbors
+    
+    def _detect(self, image):
+        gray = self.buffers.convert(image, cv2.COLOR_RGB2GRAY, 'gray', channels=1)
+        faces = self.cascade.detectMultiScale(gray, scaleFactor=1.1,
+                                              minNeighbors=self.min_neighbors, minSize=(24, 24))
+        return [(y, x + w, y + h, x) for (x, y, w, h) in faces]
+
+
+class DnnDetector(FaceDetector):
+    """OpenCV DNN face detector (res10 300x300 SSD, Caffe format)"""
+    
+    name = 'dnn'
+    
+    def __init__(self, scale=1.0, model_path='', config_path='', confidence=0.5):
+        super().__init__(scale)
+        if not (os.path.exists(model_path) and os.path.exists(config_path)):
+            raise ValueError(f"DNN model files not found ({model_path}, {config_path})")
+        self.net = cv2.dnn.readNetFromCaffe(config_path, model_path)
+        self.confidence = confidence
+    
+    def _detect(self, image):
+        height, width = image.shape[:2]
+        # The model was trained on BGR input
+        resized = self.buffers.resize(image, (300, 300), 'input')
+        blob = cv2.dnn.blobFromImage(resized, 1.0, (300, 300), (104.0, 177.0, 123.0),
+                                     swapRB=True)
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        boxes = []
+        for confidence, x0, y0, x1, y1 in detections[:, 2:7]:
+            if confidence < self.confidence:
+                continue
+            left, top = max(0, int(x0 * width)), max(0, int(y0 * height))
+            right, bottom = min(width, int(x1 * width)), min(height, int(y1 * height))
+            if right > left and bottom > top:
+                boxes.append((top, right, bottom, left))
+        return boxes
+
+
+DETECTOR_BACKENDS = ('haar', 'lbp', 'dnn', 'hog', 'cnn')
+
+
+def create_detector(name, scale=1.0, config=None):
+    """Build a detector backend by name, with paths and thresholds from settings"""
+    config = config or {}
+    if name in ('hog', 'cnn'):
+        return DlibDetector(scale, model=name)
+    if name in ('haar', 'lbp'):
+        return CascadeDetector(scale, kind=name,
+                               cascade_path=config.get("detector_cascade_path", ""))
+    if name == 'dnn':
+        return DnnDetector(scale, model_path=config.get("dnn_model_path", ""),
+                           config_path=config.get("dnn_config_path", ""),
+                           confidence=config.get("dnn_confidence", 0.5))
+    raise ValueError(f"unknown detector backend '{name}'")
+
+
+def laplacian_sharpness(gray):
+    """Variance of the Laplacian - low values mean a blurry image"""
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def build_face_template(encodings, max_exemplars=5):
+    """
+    Compact multi-sample template from a burst of encodings
+    
+    Picks up to max_exemplars samples that are spread as far apart as
+    possible (greedy farthest-point selection, starting from the sample
+    closest to the centroid) and appends the centroid itself.
+    """
+    samples = np.asarray(encodings, dtype=np.float32)
+    centroid = samples.mean(axis=0)
+    chosen = [int(np.argmin(np.linalg.norm(samples - centroid, axis=1)))]
+    nearest = np.linalg.norm(samples - samples[chosen[0]], axis=1)
+    while len(chosen) < min(max_exemplars, len(samples)):
+        index = int(np.argmax(nearest))
+        chosen.append(index)
+        nearest = np.minimum(nearest, np.linalg.norm(samples - samples[index], axis=1))
+    return np.vstack([samples[chosen], centroid[None, :]])
+
+
+class ModelWarmup:
+    """
+    Imports the heavy modules and runs one dummy detection and encoding in
+    a background thread, so models are loaded while the menu is waiting
+    """
+    
+    def __init__(self, model='hog'):
+        self.model = model
+        self.timings = {}
+        self.error = None
+        self._thread = threading.Thread(target=self._warm, daemon=True)
+    
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def _warm(self):
+        try:
+            started = time.perf_counter()
+            image = np.zeros((96, 96, 3), dtype=np.uint8)
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            face_recognition.face_locations  # dlib models load on import
+            self.timings["imports"] = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            face_recognition.face_locations(image, model=self.model)
+            self.timings["detect"] = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            face_recognition.face_encodings(image, [(8, 88, 88, 8)])
+            self.timings["encode"] = time.perf_counter() - started
+        except Exception as e:
+            self.error = e
+    
+    def wait(self, timeout=None):
+        """Block until warm-up finishes; returns the seconds spent waiting"""
+        started = time.perf_counter()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        return time.perf_counter() - started
+    
+    def report(self, waited=0.0):
+        """One-line summary of import and first-inference timings"""
+        if self.error is not None:
+            return f"⚠️  Model warm-up failed: {self.error}"
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in sorted(IMPORT_TIMES.items())]
+        parts += [f"first {stage} {self.timings[stage] * 1000:.0f}ms"
+                  for stage in ("detect", "encode") if stage in self.timings]
+        return f"🔥 Models ready ({', '.join(parts)}; waited {waited:.2f}s)"
+
+
+class FaceTracker:
+    """
+    Detect-then-track face locator
+    
+    Full detection runs on a downscaled frame and the boxes are mapped back
+    to full resolution. Between detections each face is followed by
+    searching only a small region around its last box. A full re-detection
+    happens every redetect_interval frames or as soon as a face is lost.
+    """
+    
+    def __init__(self, detect_scale=0.5, redetect_interval=10, roi_margin=0.5,
+                 model='hog', buffers=None):
+        self.detect_scale = detect_scale
+        self.redetect_interval = redetect_interval
+        self.roi_margin = roi_margin
+        self.model = model
+        self.buffers = buffers
+        self.full_detections = 0
+        self.roi_searches = 0
+        self.reset()
+    
+    def reset(self):
+        """Forget tracked faces so the next frame runs a full detection"""
+        self.boxes = []
+        self.frames_since_detect = 0
+    
+    def locate(self, rgb_frame):
+        """Return face boxes (top, right, bottom, left) in full-resolution coordinates"""
+        if not self.boxes or self.frames_since_detect >= self.redetect_interval:
+            return self._detect(rgb_frame)
+        
+        tracked = []
+        for box in self.boxes:
+            found = self._search_roi(rgb_frame, box)
+            if found is None:
+                # Tracking confidence dropped - fall back to full detection
+                return self._detect(rgb_frame)
+            tracked.append(found)
+        self.boxes = tracked
+        self.frames_since_detect += 1
+        return tracked
+    
+    def _detect(self, rgb_frame):
+        self.full_detections += 1
+        self.boxes = locate_faces(rgb_frame, self.detect_scale, self.model,
+                                  buffers=self.buffers)
+        self.frames_since_detect = 0
+        return self.boxes
+    
+    def _search_roi(self, rgb_frame, box):
+        """Look for a face only in the neighbourhood of its previous box"""
+        self.roi_searches += 1
+        height, width = rgb_frame.shape[:2]
+        top, right, bottom, left = box
+        margin_y = int((bottom - top) * self.roi_margin)
+        margin_x = int((right - left) * self.roi_margin)
+        y0, y1 = max(0, top - margin_y), min(height, bottom + margin_y)
+        x0, x1 = max(0, left - margin_x), min(width, right + margin_x)
+        candidates = locate_faces(rgb_frame[y0:y1, x0:x1], self.detect_scale, self.model,
+                                  x0, y0, buffers=self.buffers)
+        if not candidates:
+            return None
+        
+        # Keep the candidate closest to where the face was, if it is plausible
+        center_x, center_y = (left + right) / 2, (top + bottom) / 2
+        best = min(candidates, key=lambda b: abs((b[3] + b[1]) / 2 - center_x) +
+                                             abs((b[0] + b[2]) / 2 - center_y))
+        size_ratio = (best[2] - best[0]) / max(1, bottom - top)
+        if not 0.5 <= size_ratio <= 2.0:
+            return None
+        return best
+
+
+class MotionGate:
+    """
+    Cheap change detector in front of face detection
+    
+    Each frame is reduced to a tiny grayscale thumbnail and compared with
+    the thumbnail of the frame the last verdict was computed on. While the
+    mean difference stays under the threshold the previous 'authorized' or
+    'absent' verdict is reused, up to max_age seconds old.
+    """
+    
+    def __init__(self, threshold=3.0, max_age=5.0, thumb_size=(32, 24)):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.thumb_size = thumb_size
+        self.skipped = 0
+        self.passed = 0
+        self._thumbs = None
+        self.reset()
+    
+    def reset(self):
+        self.reference = None
+        self.verdict = None
+        self.verdict_time = 0.0
+        self._pending = None
+    
+    def check(self, frame, now=None):
+        """Return the cached verdict if the scene is unchanged, else None"""
+        now = time.time() if now is None else now
+        # Thumbnails alternate between two buffers; the reference one is never reused
+        if self._thumbs is None:
+            width, height = self.thumb_size
+            self._thumbs = FrameBuffers(depth=1)
+            self._gray = [np.empty((height, width), np.uint8) for _ in range(2)]
+            self._diff = np.empty((height, width), np.uint8)
+        small = self._thumbs.resize(frame, self.thumb_size, 'thumb')
+        pending = self._gray[1] if self.reference is self._gray[0] else self._gray[0]
+        self._pending = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=pending)
+        
+        if (self.verdict is not None and now - self.verdict_time <= self.max_age and
+                float(cv2.absdiff(self._pending, self.reference, dst=self._diff).mean())
+                <= self.threshold):
+            self.skipped += 1
+            return self.verdict
+        self.passed += 1
+        return None
+    
+    def update(self, verdict, now=None):
+        """Remember the verdict computed for the frame last passed to check()"""
+        if verdict in ('authorized', 'absent') and self._pending is not None:
+            self.reference = self._pending
+            self.verdict = verdict
+            self.verdict_time = time.time() if now is None else now
+        else:
+            # Never reuse an unauthorized verdict - always look again
+            self.reset()
+
+
+class FaceQualityGate:
+    """
+    Cheap quality check of each detected face before it is encoded
+    
+    Checks run cheapest first: face size, clipping at the frame edge,
+    brightness of the face crop, sharpness (variance of the Laplacian) and
+    head pose from dlib's 5-point landmarks (the nose's offset from the
+    midpoint between the eyes, relative to the eye distance). assess()
+    returns the first failed check, or None for a face worth encoding.
+    """
+    
+    reasons = ('small', 'clipped', 'dark', 'bright', 'blurry', 'pose')
+    
+    def __init__(self, min_face_size=60, min_brightness=40, max_brightness=225,
+                 min_sharpness=30.0, max_yaw=0.35, check_pose=True, max_deferrals=5,
+                 edge_margin=2):
+        self.min_face_size = min_face_size
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_sharpness = min_sharpness
+        self.max_yaw = max_yaw
+        self.check_pose = check_pose
+        self.max_deferrals = max_deferrals
+        self.edge_margin = edge_margin
+        self.skipped = collections.Counter()
+        self.passed = 0
+        self.forced = 0
+        self.consecutive_deferrals = 0
+        self.buffers = FrameBuffers(depth=1)
+    
+    def assess(self, rgb_frame, box):
+        top, right, bottom, left = box
+        height, width = rgb_frame.shape[:2]
+        if min(bottom - top, right - left) < self.min_face_size:
+            return 'small'
+        margin = self.edge_margin
+        if top < margin or left < margin or bottom > height - margin or right > width - margin:
+            return 'clipped'
+        
+        gray = self.buffers.convert(rgb_frame[top:bottom, left:right], cv2.COLOR_RGB2GRAY,
+                                    'gray', channels=1)
+        brightness = float(gray.mean())
+        if brightness < self.min_brightness:
+            return 'dark'
+        if brightness > self.max_brightness:
+            return 'bright'
+        if laplacian_sharpness(gray) < self.min_sharpness:
+            return 'blurry'
+        
+        if self.check_pose:
+            landmarks = face_recognition.face_landmarks(rgb_frame, [box], model='small')
+            if landmarks:
+                left_eye = np.mean(landmarks[0]["left_eye"], axis=0)
+                right_eye = np.mean(landmarks[0]["right_eye"], axis=0)
+                nose = np.asarray(landmarks[0]["nose_tip"][0], dtype=np.float64)
+                eye_distance = float(np.linalg.norm(right_eye - left_eye)) or 1.0
+                yaw = abs(nose[0] - (left_eye[0] + right_eye[0]) / 2) / eye_distance
+                if yaw > self.max_yaw:
+                    return 'pose'
+        return None
+    
+    def select(self, rgb_frame, boxes):
+        """
+        Faces worth encoding, or None to defer this frame
+        
+        A frame is deferred only when every face fails; after max_deferrals
+        deferrals in a row all faces are encoded anyway, so a dark room or a
+        turned head can never postpone a verdict indefinitely.
+        """
+        good = []
+        for box in boxes:
+            reason = self.assess(rgb_frame, box)
+            if reason is None:
+                good.append(box)
+            else:
+                self.skipped[reason] += 1
+        if good:
+            self.passed += 1
+            self.consecutive_deferrals = 0
+            return good
+        if self.consecutive_deferrals < self.max_deferrals:
+            self.consecutive_deferrals += 1
+            return None
+        self.forced += 1
+        self.consecutive_deferrals = 0
+        return boxes
+
+
+class FaceGallery:
+    """
+    Enrolled identities stored as one contiguous (N x 128) matrix
+    
+    Every identity may have several encodings. All detected faces are
+    matched against the whole gallery with a single matrix product, using
+    |q - g|^2 = |q|^2 + |g|^2 - 2 q.g. Large galleries can be kept as
+    float16 or int8 to cut memory; those are widened block by block
+    while matching.
+    """
+    
+    dimensions = 128
+    block_rows = 4096
+    # Template store vector type for each quantization
+    store_types = {'none': 'float32', 'float16': 'float16', 'int8': 'int8'}
+    
+    def __init__(self, quantization='none'):
+        self.quantization = quantization
+        self.names = []
+        self.labels = np.zeros(0, dtype=np.int32)
+        self.encodings = np.zeros((0, self.dimensions), dtype=np.float32)
+        self._matrix = None
+    
+    def __len__(self):
+        return len(self.labels)
+    
+    def add_identity(self, name, encodings, replace=True):
+        """Enroll encodings for name, replacing any it already had by default"""
+        if replace:
+            self.remove_identity(name)
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dimensions)
+        if name not in self.names:
+            self.names.append(name)
+        label = self.names.index(name)
+        self.encodings = np.ascontiguousarray(np.vstack([self.encodings, encodings]))
+        self.labels = np.concatenate([self.labels,
+                                      np.full(len(encodings), label, dtype=np.int32)])
+        self._matrix = None
+    
+    def remove_identity(self, name):
+        """Drop every encoding enrolled for name"""
+        if name not in self.names:
+            return False
+        label = self.names.index(name)
+        keep = self.labels != label
+        self.encodings = np.ascontiguousarray(self.encodings[keep])
+        labels = self.labels[keep]
+        # Shift labels of identities enrolled after the removed one
+        self.labels = np.where(labels > label, labels - 1, labels).astype(np.int32)
+        self.names.pop(label)
+        self._matrix = None
+        return True
+    
+    def set_quantization(self, quantization):
+        """Switch storage precision; the matrix is rebuilt on the next match"""
+        self.quantization = quantization
+        self._matrix = None
+    
+    def _prepare(self):
+        """Build the (optionally quantized) matrix and its squared norms"""
+        if self.quantization == 'int8':
+            self._scale = float(np.abs(self.encodings).max() or 1.0) / 127.0
+            self._matrix = np.round(self.encodings / self._scale).astype(np.int8)
+        elif self.quantization == 'float16':
+            self._scale = 1.0
+            self._matrix = self.encodings.astype(np.float16)
+        else:
+            self._scale = 1.0
+            self._matrix = self.encodings
+        widened = self._matrix.astype(np.float32) * self._scale
+        self._sq_norms = np.einsum('ij,ij->i', widened, widened)
+    
+    def match(self, face_encodings):
+        """
+        Match every face against the whole gallery at once
+        
+        Returns:
+            (names, distances) - best identity and its distance for each face
+        """
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.dimensions)
+        if len(queries) == 0 or len(self) == 0:
+            return [None] * len(queries), np.full(len(queries), np.inf, dtype=np.float32)
+        if self._matrix is None:
+            self._prepare()
+        
+        best_rows = np.zeros(len(queries), dtype=np.int64)
+        best_sq = np.full(len(queries), np.inf, dtype=np.float32)
+        query_sq = np.einsum('ij,ij->i', queries, queries)
+        for start in range(0, len(self), self.block_rows):
+            block = self._matrix[start:start + self.block_rows]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32) * self._scale
+            sq = (query_sq[:, None] + self._sq_norms[None, start:start + len(block)]
+                  - 2.0 * (queries @ block.T))
+            rows = np.argmin(sq, axis=1)
+            values = sq[np.arange(len(queries)), rows]
+            better = values < best_sq
+            best_sq[better] = values[better]
+            best_rows[better] = rows[better] + start
+        
+        distances = np.sqrt(np.maximum(best_sq, 0.0))
+        names = [self.names[self.labels[row]] for row in best_rows]
+        return names, distances
+    
+    def save(self, path):
+        """Write the gallery as a template store, at the gallery's precision"""
+        TemplateStore(path).write(self.names, self.labels, self.encodings,
+                                  self.store_types[self.quantization], self.dimensions)
+    
+    def load(self, path):
+        """Load a template store; anything else raises ValueError"""
+        self.names, self.labels, self.encodings = TemplateStore(path).load()
+        self._matrix = None
+    
+    def load_legacy(self, path, default_name="default"):
+        """
+        Read one of the older pickled gallery formats
+        
+        Unpickling runs arbitrary code, so only the one-time migration of
+        the legacy gallery file calls this.
+        """
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if isinstance(data, dict):
+            self.names = list(data["names"])
+            self.labels = np.asarray(data["labels"], dtype=np.int32)
+            self.encodings = np.ascontiguousarray(data["encodings"], dtype=np.float32)
+            self._matrix = None
+        else:
+            # Version 0: a single pickled encoding for one user
+            self.names, self.labels = [], np.zeros(0, dtype=np.int32)
+            self.encodings = np.zeros((0, self.dimensions), dtype=np.float32)
+            self.add_identity(default_name, data)
+
+
+class TemplateStore:
+    """
+    Versioned binary file of face templates, memory-mapped when loaded
+    
+    A 64-byte header (magic, format version, dimensions, vector type,
+    record size, record count, live record count and a CRC32 of the
+    header) is followed by fixed-size records. Each record holds an
+    active flag, the identity name, a scale for int8 vectors, a CRC32 of
+    its contents and the vector itself. Identities are appended at the end
+    and removed by clearing their flag, so neither rewrites the file;
+    compact() drops removed records.
+    """
+    
+    magic = b'TTFACES\x00'
+    version = 1
+    header_size = 64
+    # magic, version, dimensions, vector type, reserved, record size, count, live
+    header_format = struct.Struct('<8sHHHHIII')
+    vector_types = {'float32': (0, '<f4'), 'float16': (1, '<f2'), 'int8': (2, 'i1')}
+    name_bytes = 55
+    
+    def __init__(self, path):
+        self.path = path
+    
+    @classmethod
+    def is_store(cls, path):
+        """True if path starts with the template store magic"""
+        try:
+            with open(path, 'rb') as f:
+                return f.read(len(cls.magic)) == cls.magic
+        except OSError:
+            return False
+    
+    @classmethod
+    def record_dtype(cls, dimensions, vector_type):
+        """Numpy layout of one record"""
+        return np.dtype([('active', 'u1'), ('name', f'S{cls.name_bytes}'), ('scale', '<f4'),
+                         ('crc', '<u4'), ('vector', cls.vector_types[vector_type][1],
+                                          (dimensions,))])
+    
+    def _pack_header(self, header):
+        fields = self.header_format.pack(
+            self.magic, self.version, header["dimensions"],
+            self.vector_types[header["vector_type"]][0], 0,
+            header["record_size"], header["count"], header["live"])
+        fields += struct.pack('<I', zlib.crc32(fields))
+        return fields.ljust(self.header_size, b'\x00')
+    
+    def read_header(self, f=None):
+        """Parse and check the header, raising ValueError if it is not a valid store"""
+        if f is None:
+            with open(self.path, 'rb') as f:
+                return self.read_header(f)
+        f.seek(0)
+        raw = f.read(self.header_size)
+        if len(raw) < self.header_size or not raw.startswith(self.magic):
+            raise ValueError(f"{self.path} is not a template store")
+        fields = raw[:self.header_format.size]
+        (_, version, dimensions, type_code, _, record_size, count,
+         live) = self.header_format.unpack(fields)
+        (crc,) = struct.unpack_from('<I', raw, self.header_format.size)
+        if crc != zlib.crc32(fields):
+            raise ValueError(f"{self.path}: header checksum mismatch")
+        if version != self.version:
+            raise ValueError(f"{self.path}: unsupported format version {version}")
+        vector_type = next((name for name, (code, _) in self.vector_types.items()
+                            if code == type_code), None)
+        if vector_type is None:
+            raise ValueError(f"{self.path}: unknown vector type {type_code}")
+        if record_size != self.record_dtype(dimensions, vector_type).itemsize:
+            raise ValueError(f"{self.path}: record size does not match the header")
+        return {"dimensions": dimensions, "vector_type": vector_type,
+                "record_size": record_size, "count": count, "live": live}
+    
+    def _records(self, header, mode='r'):
+        """Memory-map the records the header covers"""
+        dtype = self.record_dtype(header["dimensions"], header["vector_type"])
+        if header["count"] == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode=mode, offset=self.header_size,
+                         shape=(header["count"],))
+    
+    @staticmethod
+    def _record_crcs(records):
+        """CRC32 of each record, covering everything except its flag and the CRC itself"""
+        crc_at = records.dtype.fields['crc'][1]
+        raw = np.ascontiguousarray(records).view(np.uint8).reshape(len(records), -1)
+        return np.fromiter((zlib.crc32(row[crc_at + 4:], zlib.crc32(row[1:crc_at]))
+                            for row in raw), dtype=np.uint32, count=len(raw))
+    
+    def _pack_records(self, names, encodings, header):
+        """Build records for name/encoding pairs at the store's precision"""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, header["dimensions"])
+        records = np.zeros(len(encodings),
+                           dtype=self.record_dtype(header["dimensions"], header["vector_type"]))
+        records['active'] = 1
+        encoded = {name: name.encode('utf-8') for name in set(names)}
+        for name, raw in encoded.items():
+            if len(raw) > self.name_bytes:
+                raise ValueError(f"identity name longer than {self.name_bytes} bytes: {name}")
+        records['name'] = [encoded[name] for name in names]
+        if header["vector_type"] == 'int8':
+            # One scale per record, so appending never re-quantizes the rest
+            scales = np.abs(encodings).max(axis=1)
+            scales = np.where(scales > 0, scales, 1.0) / 127.0
+            records['scale'] = scales
+            records['vector'] = np.round(encodings / scales[:, None])
+        else:
+            records['scale'] = 1.0
+            records['vector'] = encodings
+        records['crc'] = self._record_crcs(records)
+        return records
+    
+    def write(self, names, labels, encodings, vector_type='float32', dimensions=128):
+        """Write a complete store, replacing the file atomically"""
+        header = {"dimensions": dimensions, "vector_type": vector_type,
+                  "record_size": self.record_dtype(dimensions, vector_type).itemsize}
+        records = self._pack_records([names[label] for label in labels], encodings, header)
+        header["count"] = header["live"] = len(records)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(self._pack_header(header))
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+    
+    def append(self, name, encodings):
+        """Add encodings for name at the end of the file"""
+        with open(self.path, 'r+b') as f:
+            header = self.read_header(f)
+            records = self._pack_records([name] * len(encodings), encodings, header)
+            # Records first, then the header that covers them, so a crash
+            # in between leaves the old contents intact
+            f.seek(self.header_size + header["count"] * header["record_size"])
+            f.write(records.tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+            header["count"] += len(records)
+            header["live"] += len(records)
+            f.seek(0)
+            f.write(self._pack_header(header))
+        return len(records)
+    
+    def remove(self, name):
+        """Tombstone every record of name; returns how many were removed"""
+        header = self.read_header()
+        records = self._records(header, mode='r+')
+        hits = (records['active'] == 1) & (records['name'] == name.encode('utf-8'))
+        removed = int(hits.sum())
+        if removed:
+            records['active'][hits] = 0
+            records.flush()
+            header["live"] -= removed
+            with open(self.path, 'r+b') as f:
+                f.write(self._pack_header(header))
+        del records
+        return removed
+    
+    def replace_identity(self, name, encodings):
+        """Swap the encodings stored for name, compacting once half the file is removed"""
+        self.remove(name)
+        self.append(name, encodings)
+        header = self.read_header()
+        if header["count"] > 2 * header["live"]:
+            self.compact()
+    
+    def compact(self):
+        """Rewrite the file without removed records"""
+        header = self.read_header()
+        names, labels, encodings = self.load()
+        self.write(names, labels, encodings, header["vector_type"], header["dimensions"])
+    
+    def load(self, verify=True):
+        """
+        Memory-map the live records
+        
+        Returns:
+            (names, labels, encodings) - float32 encodings share memory with
+            the file when nothing was removed
+        """
+        header = self.read_header()
+        records = self._records(header)
+        if len(records) == 0:
+            return [], np.zeros(0, dtype=np.int32), np.zeros((0, header["dimensions"]),
+                                                              dtype=np.float32)
+        live = records['active'] == 1
+        if verify:
+            corrupt = live & (self._record_crcs(records) != records['crc'])
+            for index in np.flatnonzero(corrupt):
+                print(f"⚠️  Skipping corrupt template record {index} in {self.path}")
+            live &= ~corrupt
+        if not live.all():
+            records = records[live]
+        
+        # Identities in the order they were first enrolled
+        names, first, labels = np.unique(records['name'], return_index=True,
+                                         return_inverse=True)
+        order = np.argsort(first)
+        labels = np.argsort(order)[labels.ravel()]
+        vectors = records['vector']
+        if header["vector_type"] == 'int8':
+            vectors = vectors.astype(np.float32) * records['scale'][:, None]
+        elif header["vector_type"] == 'float16':
+            vectors = vectors.astype(np.float32)
+        return ([names[i].decode('utf-8') for i in order], labels.astype(np.int32), vectors)
+
+
+GALLERY_FILE = "authorized_faces.tpl"
+LEGACY_GALLERY_FILE = "authorized_user.pkl"
+
+
+def migrate_legacy_gallery(path=GALLERY_FILE, legacy_path=LEGACY_GALLERY_FILE,
+                           quantization='none'):
+    """
+    One-time conversion of the pickled gallery into a template store
+    
+    Returns the migrated gallery, or None when there was nothing to do.
+    """
+    if os.path.exists(path) or not os.path.exists(legacy_path):
+        return None
+    gallery = FaceGallery(quantization=quantization)
+    gallery.load_legacy(legacy_path, default_name=getpass.getuser())
+    gallery.save(path)
+    print(f"📦 Migrated {len(gallery)} encodings ({', '.join(gallery.names)}) from "
+          f"{legacy_path} to {path}. The old file is no longer read and can be deleted.")
+    return gallery
+
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+class IdentityCache:
+    """
+    Reuses match results for a face that has not moved
+    
+    Entries are keyed by the face box the encoding was computed on. A new
+    box reuses an entry while it overlaps it by at least iou_threshold,
+    its center has drifted less than max_drift (as a fraction of the face
+    width) and the entry is younger than ttl, so faces are re-encoded on
+    a schedule and as soon as the box jumps. Only matched identities are
+    cached; unknown faces are always encoded again.
+    """
+    
+    max_entries = 16
+    
+    def __init__(self, ttl=3.0, iou_threshold=0.6, max_drift=0.25):
+        self.ttl = ttl
+        self.iou_threshold = iou_threshold
+        self.max_drift = max_drift
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.entries = []
+    
+    def reset(self):
+        self.entries = []
+    
+    def lookup(self, box, now=None):
+        """Return the cached (name, distance, encoding) for box, or None on a miss"""
+        now = time.time() if now is None else now
+        for entry_box, name, distance, created, encoding in self.entries:
+            if box_iou(box, entry_box) < self.iou_threshold:
+                continue
+            width = max(1, entry_box[1] - entry_box[3])
+            drift = (abs((box[1] + box[3]) - (entry_box[1] + entry_box[3])) +
+                     abs((box[0] + box[2]) - (entry_box[0] + entry_box[2]))) / 2 / width
+            if drift > self.max_drift:
+                continue
+            if now - created > self.ttl:
+                self.expired += 1
+                continue
+            self.hits += 1
+            return name, distance, encoding
+        self.misses += 1
+        return None
+    
+    def store(self, box, name, distance, encoding, now=None):
+        """Remember a fresh match for box"""
+        now = time.time() if now is None else now
+        self.entries = [e for e in self.entries
+                        if now - e[3] <= self.ttl and box_iou(box, e[0]) < self.iou_threshold]
+        self.entries.append((box, name, distance, now, encoding))
+        del self.entries[:-self.max_entries]
+    
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "expired": self.expired,
+                "hit_rate": self.hits / total if total else 0.0}
+
+
+class AdaptiveScheduler:
+    """
+    Per-state sampling rates replacing the fixed check_interval sleep
+    
+    Each state has a (fastest, slowest) interval. The interval starts at
+    the fastest value when the state changes and grows by backoff every
+    tick the state stays the same, so a user who sits still for hours is
+    sampled rarely while a countdown or a suspicious face is sampled fast.
+    """
+    
+    states = ('stable', 'countdown', 'returned', 'suspect')
+    
+    def __init__(self, intervals, backoff=1.5, baseline_interval=0.1):
+        self.intervals = {state: tuple(intervals[state]) for state in self.states}
+        self.backoff = backoff
+        self.baseline_interval = baseline_interval
+        self.state = None
+        self.interval = 0.0
+        self.ticks = 0
+        self.busy_time = 0.0
+        self.sleep_time = 0.0
+        self.cpu_time = 0.0
+        self._tick_started = None
+        self._cpu_started = None
+    
+    @classmethod
+    def fixed(cls, interval):
+        """Scheduler that always sleeps the same interval"""
+        return cls({state: (interval, interval) for state in cls.states},
+                   backoff=1.0, baseline_interval=interval)
+    
+    def next_interval(self, state):
+        """Interval to sleep for the current state"""
+        fastest, slowest = self.intervals[state]
+        if state != self.state:
+            # Speed up immediately on any change
+            self.state = state
+            self.interval = fastest
+        else:
+            self.interval = min(slowest, max(fastest, self.interval * self.backoff))
+        return self.interval
+    
+    def wait(self, state, limit=None):
+        """Account for the tick that just ran, then sleep until the next one"""
+        now, cpu = time.perf_counter(), time.process_time()
+        if self._tick_started is not None:
+            self.ticks += 1
+            self.busy_time += now - self._tick_started
+            self.cpu_time += cpu - self._cpu_started
+        interval = self.next_interval(state)
+        if limit is not None:
+            interval = min(interval, max(0.0, limit))
+        self.sleep_time += interval
+        time.sleep(interval)
+        self._tick_started, self._cpu_started = time.perf_counter(), time.process_time()
+        return interval
+    
+    def stats(self):
+        """Effective rate and estimated CPU saved against the fixed baseline interval"""
+        elapsed = self.busy_time + self.sleep_time
+        if not self.ticks or elapsed <= 0:
+            return {"ticks": 0, "rate": 0.0, "cpu_saved": 0.0, "baseline_rate": 0.0}
+        tick_busy = self.busy_time / self.ticks
+        tick_cpu = self.cpu_time / self.ticks
+        baseline_ticks = elapsed / (self.baseline_interval + tick_busy)
+        return {"ticks": self.ticks,
+                "rate": self.ticks / elapsed,
+                "baseline_rate": baseline_ticks / elapsed,
+                "cpu_saved": max(0.0, baseline_ticks - self.ticks) * tick_cpu}
+
+
+# Per-process state for InferencePipeline workers, set by the initializer
+_worker_state = {}
+
+
+def _init_inference_worker(names, labels, encodings, quantization, detect_scale, model):
+    """Build a private copy of the gallery in each worker process"""
+    gallery = FaceGallery(quantization=quantization)
+    gallery.names = list(names)
+    gallery.labels = labels
+    gallery.encodings = encodings
+    _worker_state.update(gallery=gallery, detect_scale=detect_scale, model=model,
+                         buffers=FrameBuffers(depth=1))
+
+
+def _infer_frame(frame):
+    """Detection, encoding and gallery matching for one BGR frame"""
+    buffers = _worker_state["buffers"]
+    rgb_frame = buffers.convert(frame, cv2.COLOR_BGR2RGB, 'rgb')
+    boxes = locate_faces(rgb_frame, _worker_state["detect_scale"], _worker_state["model"],
+                         buffers=buffers)
+    if not boxes:
+        return boxes, [], [], []
+    encodings = face_recognition.face_encodings(rgb_frame, boxes)
+    names, distances = _worker_state["gallery"].match(encodings)
+    return boxes, names, [float(d) for d in distances], encodings
+
+
+def _infer_frame_timed(frame):
+    """_infer_frame plus the worker CPU time it took, for per-core throughput"""
+    started = time.process_time()
+    result = _infer_frame(frame)
+    return result, time.process_time() - started
+
+
+class InferencePipeline:
+    """
+    Pipelined capture -> detection -> encoding/matching on a process pool
+    
+    A capture thread feeds a bounded queue that drops the oldest frame when
+    full. A dispatch thread keeps at most two frames per worker in flight,
+    and finished frames are put back in capture order before being handed
+    to the decision loop, so latency stays bounded under load while
+    throughput scales with the number of workers.
+    """
+    
+    def __init__(self, camera, gallery, workers=2, queue_size=2, detect_scale=0.5,
+                 model='hog'):
+        self.camera = camera
+        self.workers = workers
+        self.dropped = 0
+        self.errors = 0
+        self.completed = 0
+        self.capture_done = False
+        # Set once the worker pool has died; no more results will come
+        self.failure = None
+        self._frames = collections.deque(maxlen=queue_size)
+        self._results = collections.deque(maxlen=queue_size * 2)
+        self._pending = {}
+        self._submitted = 0
+        self._next_seq = 0
+        self._slots = threading.Semaphore(workers * 2)
+        self._cond = threading.Condition()
+        self._running = False
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_inference_worker,
+            initargs=(gallery.names, gallery.labels, gallery.encodings,
+                      gallery.quantization, detect_scale, model))
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True),
+                         threading.Thread(target=self._dispatch_loop, daemon=True)]
+    
+    @property
+    def exhausted(self):
+        """True once the source has ended and every result was consumed"""
+        with self._cond:
+            return (self.capture_done and not self._frames and not self._results
+                    and self._next_seq == self._submitted)
+    
+    def start(self):
+        self._running = True
+        for thread in self._threads:
+            thread.start()
+        return self
+    
+    def _capture_loop(self):
+        while self._running:
+            ret, frame = self.camera.read()
+            if not ret:
+                if self.camera.exhausted:
+                    break
+                continue
+            # Queued frames outlive the source's reused buffers, so keep a copy
+            frame = frame.copy()
+            with self._cond:
+                if len(self._frames) == self._frames.maxlen:
+                    self.dropped += 1
+                self._frames.append((time.time(), frame))
+                self._cond.notify_all()
+        with self._cond:
+            self.capture_done = True
+            self._cond.notify_all()
+    
+    def _dispatch_loop(self):
+        while self._running:
+            if not self._slots.acquire(timeout=0.5):
+                continue
+            with self._cond:
+                self._cond.wait_for(lambda: self._frames or self.capture_done or not self._running)
+                if not self._frames:
+                    self._slots.release()
+                    if self.capture_done:
+                        return
+                    continue
+                captured_at, frame = self._frames.popleft()
+                seq = self._submitted
+                self._submitted += 1
+            try:
+                future = self._pool.submit(_infer_frame, frame)
+            except concurrent.futures.process.BrokenProcessPool as e:
+                self._fail(e)
+                return
+            future.add_done_callback(
+                lambda f, seq=seq, captured_at=captured_at: self._on_result(seq, captured_at, f))
+    
+    def _on_result(self, seq, captured_at, future):
+        self._slots.release()
+        try:
+            boxes, names, distances, encodings = future.result()
+            result = {"boxes": boxes, "names": names, "distances": distances,
+                      "encodings": encodings}
+        except concurrent.futures.process.BrokenProcessPool as e:
+            self._fail(e)
+            result = {"error": e}
+        except Exception as e:
+            result = {"error": e}
+        result["captured_at"] = captured_at
+        result["latency"] = time.time() - captured_at
+        with self._cond:
+            self._pending[seq] = result
+            # Release results strictly in capture order
+            while self._next_seq in self._pending:
+                ready = self._pending.pop(self._next_seq)
+                self._next_seq += 1
+                if "error" in ready:
+                    self.errors += 1
+                    # Report the 1st, 2nd, 4th, 8th... failure so a bad run doesn't flood the output
+                    if self.errors & (self.errors - 1) == 0:
+                        print(f"⚠️  Inference failed on a frame ({self.errors} so far): "
+                              f"{ready['error']}")
+                    continue
+                if len(self._results) == self._results.maxlen:
+                    self.dropped += 1
+                self._results.append(ready)
+                self.completed += 1
+            self._cond.notify_all()
+    
+    def _fail(self, error):
+        with self._cond:
+            if self.failure is None:
+                self.failure = error
+                print(f"❌ Inference worker pool stopped: {error}")
+            self._cond.notify_all()
+    
+    def get(self, timeout=1.0):
+        """Next result in capture order, or None if nothing arrived in time"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._results, timeout)
+            return self._results.popleft() if self._results else None
+    
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._pool.shutdown(wait=False)
+
+
+class RollingHistogram:
+    """
+    Latency histogram for one stage
+    
+    Bucket counts are cumulative since start (as Prometheus expects), while
+    percentiles are computed over a ring of the most recent samples.
+    """
+    
+    # Upper bounds in seconds, 0.1 ms up to ~13 s in powers of two
+    bounds = tuple(0.0001 * 2 ** i for i in range(18))
+    
+    def __init__(self, window=1024):
+        self.window = window
+        self.recent = []
+        self.position = 0
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+    
+    def record(self, seconds):
+        if len(self.recent) < self.window:
+            self.recent.append(seconds)
+        else:
+            self.recent[self.position] = seconds
+            self.position = (self.position + 1) % self.window
+        self.buckets[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+    
+    def summary(self):
+        """Percentiles of the recent window, in milliseconds"""
+        ms = np.asarray(self.recent) * 1000.0
+        p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+        return {"count": self.count, "mean_ms": float(ms.mean()),
+                "p50_ms": float(p50), "p90_ms": float(p90),
+                "p99_ms": float(p99), "max_ms": float(ms.max())}
+
+
+class _StageTimer:
+    """Context manager timing one stage into an Instrumentation histogram"""
+    
+    __slots__ = ('histogram', 'name', 'last', 'started')
+    
+    def __init__(self, histogram, name, last):
+        self.histogram = histogram
+        self.name = name
+        self.last = last
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.histogram.record(elapsed)
+        self.last[self.name] = self.last.get(self.name, 0.0) + elapsed
+        return False
+
+
+class Instrumentation:
+    """
+    Per-stage timers, counters and loop rate for the monitoring hot path
+    
+    TimeTrap only calls into this when instrumentation is enabled; when it
+    is disabled every stage uses one shared no-op context manager.
+    """
+    
+    def __init__(self, window=1024):
+        self.window = window
+        self.histograms = {}
+        self.timers = {}
+        self.counters = collections.Counter()
+        self.started = time.time()
+        self.ticks = collections.deque(maxlen=window)
+        # Seconds spent in each stage since the last tick
+        self.last = {}
+    
+    def stage(self, name):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.histograms[name] = RollingHistogram(self.window)
+            timer = self.timers[name] = _StageTimer(self.histograms[name], name, self.last)
+        return timer
+    
+    def record(self, name, seconds):
+        """Add a duration measured elsewhere (e.g. in a worker process)"""
+        self.stage(name).histogram.record(seconds)
+    
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+    
+    def tick(self):
+        """Mark one iteration of the monitoring loop"""
+        self.ticks.append(time.perf_counter())
+        self.last.clear()
+    
+    @property
+    def loop_rate(self):
+        if len(self.ticks) < 2 or self.ticks[-1] == self.ticks[0]:
+            return 0.0
+        return (len(self.ticks) - 1) / (self.ticks[-1] - self.ticks[0])
+    
+    def summary(self):
+        """Latency percentiles per stage, in milliseconds"""
+        return {name: hist.summary() for name, hist in self.histograms.items() if hist.count}
+    
+    def snapshot(self, extra_counters=None, series=None):
+        """
+        Everything in one JSON-serialisable dict
+        
+        series holds labelled gauges, e.g. per stream:
+        {"stream_checks": {"label": "stream", "values": {"kiosk-1": 42}}}
+        """
+        counters = dict(self.counters)
+        counters.update(extra_counters or {})
+        snapshot = {"timestamp": datetime.now().isoformat(timespec='seconds'),
+                    "uptime_seconds": time.time() - self.started,
+                    "loop_rate": self.loop_rate,
+                    "counters": counters,
+                    "stages": self.summary()}
+        if series:
+            snapshot["series"] = series
+        return snapshot
+    
+    def to_prometheus(self, extra_counters=None, series=None):
+        """Prometheus text exposition format"""
+        lines = ["# TYPE timetrap_loop_rate gauge",
+                 f"timetrap_loop_rate {self.loop_rate:.6f}"]
+        counters = dict(self.counters)
+        counters.update(extra_counters or {})
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE timetrap_{name} gauge")
+            lines.append(f"timetrap_{name} {value}")
+        for name, gauge in sorted((series or {}).items()):
+            lines.append(f"# TYPE timetrap_{name} gauge")
+            for key, value in sorted(gauge["values"].items()):
+                # Label values are free text; escape them as the format requires
+                key = str(key).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                lines.append(f'timetrap_{name}{{{gauge["label"]}="{key}"}} {value}')
+        lines.append("# TYPE timetrap_stage_seconds histogram")
+        for name, hist in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.bounds_labels(), hist.buckets):
+                cumulative += bucket
+                lines.append(f'timetrap_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'timetrap_stage_seconds_sum{{stage="{name}"}} {hist.total:.6f}')
+            lines.append(f'timetrap_stage_seconds_count{{stage="{name}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+    
+    @staticmethod
+    def bounds_labels():
+        return [f"{bound:g}" for bound in RollingHistogram.bounds] + ["+Inf"]
+    
+    def export(self, path_base, fmt='json', extra_counters=None, series=None):
+        """Atomically write path_base.json and/or path_base.prom"""
+        outputs = []
+        if fmt in ('json', 'both'):
+            outputs.append((path_base + '.json',
+                            json.dumps(self.snapshot(extra_counters, series), indent=4)))
+        if fmt in ('prometheus', 'both'):
+            outputs.append((path_base + '.prom', self.to_prometheus(extra_counters, series)))
+        for path, text in outputs:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+
+# Shared do-nothing context used when instrumentation is disabled
+_NO_STAGE = contextlib.nullcontext()
+
+
+class LockBackend:
+    """Locks the screen; subclasses implement lock() for one platform"""
+    
+    name = 'base'
+    
+    def lock(self):
+        raise NotImplementedError
+
+
+class MacLockBackend(LockBackend):
+    """macOS: send the Ctrl+Cmd+Q lock shortcut through System Events"""
+    
+    name = 'macos'
+    
+    def lock(self):
+        subprocess.run([
+            "osascript", "-e",
+            'tell application "System Events" to keystroke "q" using {control down, command down}'
+        ], check=True, timeout=10)
+
+
+class LinuxLockBackend(LockBackend):
+    """Linux: logind session lock, falling back to xdg-screensaver"""
+    
+    name = 'linux'
+    commands = (["loginctl", "lock-session"], ["xdg-screensaver", "lock"])
+    
+    def lock(self):
+        error = None
+        for command in self.commands:
+            try:
+                subprocess.run(command, check=True, timeout=10,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                return
+            except (OSError, subprocess.SubprocessError) as e:
+                error = e
+        raise error
+
+
+class NullLockBackend(LockBackend):
+    """Does nothing but count, for tests and dry runs"""
+    
+    name = 'none'
+    
+    def __init__(self):
+        self.locks = []
+    
+    def lock(self):
+        self.locks.append(time.time())
+
+
+class CommandLockBackend(LockBackend):
+    """Runs a configured command, e.g. to lock a kiosk watched by daemon mode"""
+    
+    name = 'command'
+    
+    def __init__(self, command):
+        self.command = command
+    
+    def lock(self):
+        subprocess.run(self.command, check=True, timeout=10,
+                       shell=isinstance(self.command, str),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+LOCK_BACKENDS = {
+    'macos': MacLockBackend,
+    'linux': LinuxLockBackend,
+    'none': NullLockBackend,
+}
+
+
+def create_lock_backend(name='auto'):
+    """Build a lock backend by name, or pick one for this platform"""
+    if name == 'auto':
+        if sys.platform == 'darwin':
+            name = 'macos'
+        elif sys.platform.startswith('linux'):
+            name = 'linux'
+        else:
+            print(f"⚠️  No lock backend for {sys.platform} - locking disabled")
+            name = 'none'
+    return LOCK_BACKENDS[name]()
+
+
+class ActionExecutor:
+    """
+    Runs lock and sound side effects on a background thread
+    
+    Actions are keyed; a key submitted again within debounce seconds of
+    the previous one, or while the previous one is still queued, is
+    coalesced into it. Sounds are started without waiting for them to
+    finish, so neither recognition nor a pending lock ever waits on audio.
+    """
+    
+    sounds = {
+        'darwin': {'alert': ['afplay', '/System/Library/Sounds/Sosumi.aiff'],
+                   'lock': ['afplay', '/System/Library/Sounds/Glass.aiff']},
+        'linux': {'alert': ['paplay', '/usr/share/sounds/freedesktop/stereo/dialog-warning.oga'],
+                  'lock': ['paplay', '/usr/share/sounds/freedesktop/stereo/screen-capture.oga']},
+    }
+    
+    def __init__(self, lock_backend, debounce=3.0):
+        self.lock_backend = lock_backend
+        self.debounce = debounce
+        self.executed = 0
+        self.coalesced = 0
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._last_submitted = {}
+        self._players = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+    
+    def submit(self, key, action, on_done=None):
+        """Queue action unless the same key ran or is queued recently"""
+        now = time.time()
+        with self._lock:
+            if key in self._pending or now - self._last_submitted.get(key, -1e9) < self.debounce:
+                self.coalesced += 1
+                return False
+            self._pending.add(key)
+            self._last_submitted[key] = now
+        self._queue.put((key, action, on_done))
+        return True
+    
+    def lock(self, on_done=None):
+        return self.submit('lock', self.lock_backend.lock, on_done)
+    
+    def play_sound(self, sound_type):
+        return self.submit('sound:' + sound_type, lambda: self._start_sound(sound_type))
+    
+    def _start_sound(self, sound_type):
+        platform_key = 'linux' if sys.platform.startswith('linux') else sys.platform
+        command = self.sounds.get(platform_key, {}).get(sound_type)
+        if command is None:
+            return
+        player = self._players.get(sound_type)
+        if player is not None and player.poll() is None:
+            # The same sound is still playing
+            self.coalesced += 1
+            return
+        self._players[sound_type] = subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                                                     stderr=subprocess.DEVNULL)
+    
+    def _worker(self):
+        while True:
+            key, action, on_done = self._queue.get()
+            with self._lock:
+                self._pending.discard(key)
+            error = None
+            try:
+                action()
+            except Exception as e:
+                error = e
+            self.executed += 1
+            if on_done is not None:
+                on_done(error)
+            self._queue.task_done()
+    
+    def drain(self, timeout=5.0):
+        """Wait (up to timeout) for queued actions to finish"""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+
+
+class EventLogger:
+    """
+    Background, batched JSONL activity log with rotation and a sidecar index
+    
+    log() only enqueues a record; a writer thread appends whole batches in
+    one write. The file rotates to .1, .2, ... when it would exceed
+    max_bytes or when the date changes. Every chunk_records records a line
+    is appended to the .idx sidecar with the chunk's byte range, time range
+    and event types, so the viewer can skip chunks that cannot match.
+    """
+    
+    def __init__(self, path, max_bytes=5_000_000, rotate_daily=True, backups=5,
+                 flush_interval=1.0, chunk_records=256):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.chunk_records = chunk_records
+        self.written = 0
+        self._chunk = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def log(self, event, message, **fields):
+        record = {"ts": datetime.now().isoformat(timespec='milliseconds'),
+                  "event": event, "message": message}
+        record.update(fields)
+        self._queue.put(record)
+    
+    def _worker(self):
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # Drain whatever else is already waiting into the same write
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [record for record in batch if record is not None]
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    print(f"⚠️  Could not write activity log: {e}")
+        self._close_chunk()
+    
+    def _write(self, batch):
+        lines = [json.dumps(record, ensure_ascii=False) + "\n" for record in batch]
+        data = "".join(lines).encode('utf-8')
+        self._maybe_rotate(len(data), batch[0]["ts"][:10])
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(data)
+        
+        for record, line in zip(batch, lines):
+            size = len(line.encode('utf-8'))
+            if self._chunk is None:
+                self._chunk = {"offset": offset, "length": 0, "count": 0,
+                               "first": record["ts"], "events": []}
+            chunk = self._chunk
+            chunk["length"] += size
+            chunk["count"] += 1
+            chunk["last"] = record["ts"]
+            if record["event"] not in chunk["events"]:
+                chunk["events"].append(record["event"])
+            offset += size
+            if chunk["count"] >= self.chunk_records:
+                self._close_chunk()
+        self.written += len(batch)
+    
+    def _close_chunk(self):
+        """Append the current chunk to the index"""
+        if self._chunk is None:
+            return
+        with open(self.path + '.idx', 'a') as f:
+            f.write(json.dumps(self._chunk) + "\n")
+        self._chunk = None
+    
+    def _maybe_rotate(self, incoming, today):
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        file_date = datetime.fromtimestamp(os.path.getmtime(self.path)).strftime('%Y-%m-%d')
+        if size + incoming <= self.max_bytes and not (self.rotate_daily and file_date != today):
+            return
+        self._close_chunk()
+        for number in range(self.backups - 1, 0, -1):
+            for suffix in ('', '.idx'):
+                older = f"{self.path}.{number}{suffix}"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{number + 1}{suffix}")
+        os.replace(self.path, self.path + '.1')
+        if os.path.exists(self.path + '.idx'):
+            os.replace(self.path + '.idx', self.path + '.1.idx')
+    
+    def close(self):
+        """Flush everything queued and stop the writer"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+class LogViewer:
+    """
+    Streams the activity log page by page without loading it into memory
+    
+    The .idx sidecar written by EventLogger lets date and event filters
+    seek straight to the chunks that can match. Anything the index does not
+    cover is scanned: plain-text lines from before the JSONL log, records a
+    crashed process wrote without indexing, and everything past the last
+    indexed chunk.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def files(self):
+        """Rotated backups oldest first, then the live file"""
+        backups = []
+        number = 1
+        while os.path.exists(f"{self.path}.{number}"):
+            backups.append(f"{self.path}.{number}")
+            number += 1
+        files = list(reversed(backups))
+        if os.path.exists(self.path):
+            files.append(self.path)
+        return files
+    
+    @staticmethod
+    def parse(line):
+        line = line.strip()
+        if not line:
+            return None
+        if line.startswith('{'):
+            try:
+                return json.loads(line)
+            except ValueError:
+                pass
+        # Plain-text line from before the JSONL log: "[YYYY-MM-DD HH:MM:SS] message"
+        if line.startswith('[') and '] ' in line:
+            ts, message = line[1:].split('] ', 1)
+            return {"ts": ts.replace(' ', 'T'), "event": "legacy", "message": message}
+        return {"ts": "", "event": "legacy", "message": line}
+    
+    @staticmethod
+    def _in_range(ts, start, end):
+        return ((not start or ts[:len(start)] >= start) and
+                (not end or ts[:len(end)] <= end))
+    
+    def _regions(self, path, start, end, events):
+        """Byte ranges of path that may hold matching records"""
+        indexed_end = 0
+        if os.path.exists(path + '.idx'):
+            with open(path + '.idx') as f:
+                for line in f:
+                    chunk = json.loads(line)
+                    if chunk["offset"] > indexed_end:
+                        # Bytes before this chunk that no index entry covers
+                        yield indexed_end, chunk["offset"] - indexed_end
+                    indexed_end = chunk["offset"] + chunk["length"]
+                    if start and chunk["last"][:len(start)] < start:
+                        continue
+                    if end and chunk["first"][:len(end)] > end:
+                        continue
+                    if events and not set(events) & set(chunk["events"]):
+                        continue
+                    yield chunk["offset"], chunk["length"]
+        yield indexed_end, None
+    
+    def records(self, start=None, end=None, events=None):
+        """Yield matching records, oldest first"""
+        for path in self.files():
+            with open(path, 'rb') as f:
+                for offset, length in self._regions(path, start, end, events):
+                    f.seek(offset)
+                    # The unindexed tail is streamed line by line to the end
+                    lines = f if length is None else f.read(length).splitlines()
+                    for raw in lines:
+                        record = self.parse(raw.decode('utf-8', errors='replace'))
+                        if record is None:
+                            continue
+                        if events and record["event"] not in events:
+                            continue
+                        if self._in_range(record["ts"], start, end):
+                            yield record
+    
+    def pages(self, page_size=20, **filters):
+        """Yield lists of up to page_size records"""
+        page = []
+        for record in self.records(**filters):
+            page.append(record)
+            if len(page) == page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+    
+    def tail(self, lines=20, poll_interval=0.5):
+        """Yield the last lines records, then new ones as they are written"""
+        f = open(self.path, 'rb')
+        try:
+            size = f.seek(0, os.SEEK_END)
+            # Read backwards just far enough to find the last lines
+            block = 4096
+            while True:
+                begin = max(0, size - block)
+                f.seek(begin)
+                data = f.read(size - begin)
+                if begin == 0 or data.count(b"\n") > lines:
+                    break
+                block *= 2
+            for raw in data.splitlines()[-lines:]:
+                record = self.parse(raw.decode('utf-8', errors='replace'))
+                if record is not None:
+                    yield record
+            
+            while True:
+                raw = f.readline()
+                if not raw:
+                    if os.path.exists(self.path) and os.path.getsize(self.path) < f.tell():
+                        # Rotated underneath us - continue with the new file
+                        f.close()
+                        f = open(self.path, 'rb')
+                    time.sleep(poll_interval)
+                    continue
+                record = self.parse(raw.decode('utf-8', errors='replace'))
+                if record is not None:
+                    yield record
+        finally:
+            f.close()
+    
+    @staticmethod
+    def format(record):
+        extra = {k: v for k, v in record.items() if k not in ("ts", "event", "message")}
+        details = " " + json.dumps(extra) if extra else ""
+        return f"[{record['ts'].replace('T', ' ')}] {record['event']:<14} {record['message']}{details}"
+
+
+class LockStateMachine:
+    """
+    The absence countdown and lock rules of TimeTrap.run, free of I/O
+    
+    step() takes one verdict and the time it was made and returns what
+    happened: 'returned', 'absent_started', 'countdown', 'lock_absent',
+    'lock_unauthorized' or None. Live monitoring turns these into messages
+    and actions; the offline parameter sweep replays the same rules.
+    """
+    
+    def __init__(self, lock_delay):
+        self.lock_delay = lock_delay
+        self.absent_since = None
+    
+    def remaining(self, now):
+        """Seconds left on the countdown, or None if it is not running"""
+        if self.absent_since is None:
+            return None
+        return self.lock_delay - (now - self.absent_since)
+    
+    def step(self, status, now):
+        if status == 'authorized':
+            returned = self.absent_since is not None
+            self.absent_since = None
+            return 'returned' if returned else None
+        if status == 'absent':
+            if self.absent_since is None:
+                self.absent_since = now
+                return 'absent_started'
+            if now - self.absent_since < self.lock_delay:
+                return 'countdown'
+            self.absent_since = None
+            return 'lock_absent'
+        if status == 'unauthorized':
+            self.absent_since = None
+            return 'lock_unauthorized'
+        return None
+
+
+class SessionRecorder:
+    """
+    Records what each check saw, for offline parameter sweeps
+    
+    Every check stores its timestamp, verdict, number of detected faces and
+    the embeddings behind the verdict. Parts of flush_every checks are
+    written as compressed .npz files with float16 embeddings.
+    """
+    
+    status_codes = {'absent': 0, 'authorized': 1, 'unauthorized': 2}
+    
+    def __init__(self, directory, metadata=None, flush_every=10000):
+        os.makedirs(directory, exist_ok=True)
+        self.base = os.path.join(directory, datetime.now().strftime('session_%Y%m%d_%H%M%S'))
+        self.metadata = json.dumps(metadata or {})
+        self.flush_every = flush_every
+        self.part = 0
+        self._reset()
+    
+    def _reset(self):
+        self.timestamps = []
+        self.statuses = []
+        self.face_counts = []
+        self.offsets = [0]
+        self.embeddings = []
+    
+    def record(self, timestamp, status, face_count, encodings):
+        self.timestamps.append(timestamp)
+        self.statuses.append(self.status_codes.get(status, 0))
+        self.face_counts.append(face_count)
+        self.embeddings.extend(encodings)
+        self.offsets.append(len(self.embeddings))
+        if len(self.timestamps) >= self.flush_every:
+            self.flush()
+    
+    def flush(self):
+        if not self.timestamps:
+            return
+        path = f"{self.base}_part{self.part:03d}.npz"
+        np.savez_compressed(
+            path,
+            timestamps=np.asarray(self.timestamps, dtype=np.float64),
+            statuses=np.asarray(self.statuses, dtype=np.uint8),
+            face_counts=np.asarray(self.face_counts, dtype=np.uint16),
+            offsets=np.asarray(self.offsets, dtype=np.int64),
+            embeddings=np.asarray(self.embeddings, dtype=np.float16).reshape(-1, FaceGallery.dimensions),
+            metadata=np.asarray(self.metadata))
+        self.part += 1
+        self._reset()
+    
+    def close(self):
+        self.flush()
+
+
+class FlightRecorder:
+    """
+    Fixed-size ring of the most recent checks, saved to disk when a lock fires
+    
+    Every array is allocated up front: a small thumbnail of each frame, up
+    to max_faces boxes and match distances, and the time spent in each
+    stage. Recording a check overwrites the oldest slot in place, so memory
+    stays constant and nothing is copied or written until dump() is called
+    for an incident. dump() copies the ring in time order and compresses it
+    to an .npz file on a background thread.
+    """
+    
+    stages = ('read', 'motion', 'presence', 'convert', 'detect', 'quality', 'encode',
+              'match', 'confirm')
+    status_codes = {'absent': 0, 'authorized': 1, 'unauthorized': 2, 'none': 3}
+    # How each verdict was reached
+    paths = ('none', 'motion', 'presence', 'identity', 'cached', 'deferred', 'pipeline')
+    
+    def __init__(self, capacity=120, thumb_size=(96, 72), max_faces=4):
+        width, height = thumb_size
+        self.capacity = capacity
+        self.thumb_size = thumb_size
+        self.max_faces = max_faces
+        self.thumbs = np.zeros((capacity, height, width, 3), dtype=np.uint8)
+        self.frame_sizes = np.zeros((capacity, 2), dtype=np.int32)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.statuses = np.zeros(capacity, dtype=np.uint8)
+        self.check_paths = np.zeros(capacity, dtype=np.uint8)
+        self.face_counts = np.zeros(capacity, dtype=np.uint16)
+        self.boxes = np.zeros((capacity, max_faces, 4), dtype=np.int32)
+        self.distances = np.full((capacity, max_faces), np.nan, dtype=np.float32)
+        self.timings = np.full((capacity, len(self.stages)), np.nan, dtype=np.float32)
+        self.count = 0
+        self.writers = []
+    
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (
+            self.thumbs, self.frame_sizes, self.timestamps, self.statuses, self.check_paths,
+            self.face_counts, self.boxes, self.distances, self.timings))
+    
+    def record(self, timestamp, status, path, frame, boxes, distances, timings):
+        """Overwrite the oldest slot with one check"""
+        slot = self.count % self.capacity
+        self.timestamps[slot] = timestamp
+        self.statuses[slot] = self.status_codes[status or 'none']
+        self.check_paths[slot] = self.paths.index(path)
+        self.face_counts[slot] = len(boxes)
+        self.boxes[slot] = 0
+        for i, box in enumerate(boxes[:self.max_faces]):
+            self.boxes[slot, i] = box
+        self.distances[slot] = np.nan
+        for i, distance in enumerate(distances[:self.max_faces]):
+            self.distances[slot, i] = distance
+        self.timings[slot] = np.nan
+        for i, name in enumerate(self.stages):
+            if name in timings:
+                self.timings[slot, i] = timings[name] * 1000.0
+        if frame is None:
+            self.frame_sizes[slot] = 0
+            self.thumbs[slot] = 0
+        else:
+            self.frame_sizes[slot] = frame.shape[:2]
+            cv2.resize(frame, self.thumb_size, dst=self.thumbs[slot],
+                       interpolation=cv2.INTER_AREA)
+        self.count += 1
+    
+    def dump(self, directory, reason, metadata=None):
+        """Save the recorded checks, oldest first, without blocking; returns the path"""
+        held = min(self.count, self.capacity)
+        order = (np.arange(held) + self.count - held) % self.capacity
+        # Only the copy happens here; compression and disk I/O run in the background
+        arrays = {name: getattr(self, name)[order] for name in (
+            'thumbs', 'frame_sizes', 'timestamps', 'statuses', 'check_paths', 'face_counts',
+            'boxes', 'distances', 'timings')}
+        metadata = dict(metadata or {}, reason=reason, stages=list(self.stages),
+                        statuses=list(self.status_codes), paths=list(self.paths),
+                        saved=datetime.now().isoformat(timespec='seconds'))
+        arrays["metadata"] = np.asarray(json.dumps(metadata))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory,
+                            f"incident_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}_{reason}.npz")
+        writer = threading.Thread(target=np.savez_compressed, args=(path,), kwargs=arrays,
+                                  daemon=True)
+        writer.start()
+        self.writers = [w for w in self.writers if w.is_alive()] + [writer]
+        return path
+    
+    def wait(self, timeout=10.0):
+        """Let incident files still being written finish"""
+        for writer in self.writers:
+            writer.join(timeout)
+        self.writers = []
+
+
+class TimeTrap:
+    # Components rebuilt when one of their settings changes while monitoring;
+    # every other hot setting is a plain value applied in place
+    component_settings = {
+        'metrics': ('stats_enabled',),
+        'tracker': ('tracking_enabled', 'detect_scale', 'redetect_interval', 'roi_margin',
+                    'detector_model'),
+        'motion_gate': ('motion_gate_enabled', 'motion_threshold', 'max_verdict_age',
+                        'tolerance'),
+        'presence_detector': ('two_tier_detection', 'presence_detector', 'presence_scale',
+                              'detector_cascade_path', 'dnn_model_path', 'dnn_config_path',
+                              'dnn_confidence'),
+        'identity_cache': ('identity_cache_enabled', 'identity_cache_ttl',
+                           'identity_cache_iou', 'identity_cache_drift'),
+        'scheduler': ('adaptive_sampling', 'sampling_intervals', 'sampling_backoff',
+                      'check_interval'),
+        'logger': ('log_enabled', 'log_max_bytes', 'log_rotate_daily', 'log_backups'),
+        'quality_gate': ('quality_gate_enabled', 'quality_min_face_size',
+                         'quality_min_brightness', 'quality_max_brightness',
+                         'quality_min_sharpness', 'quality_max_yaw', 'quality_check_pose',
+                         'quality_max_deferrals'),
+        'flight_recorder': ('flight_recorder_enabled', 'flight_recorder_size'),
+    }
+    # Settings that need the camera, worker pool, recorder or settings watcher reopened
+    restart_settings = ('frame_source', 'frame_width', 'frame_height', 'frame_fps',
+                        'buffer_size', 'threaded_capture', 'pipeline_workers',
+                        'pipeline_queue_size', 'record_sessions', 'session_dir',
+                        'settings_hot_reload', 'settings_poll_interval')
+    
+    def __init__(self, settings_manager):
+        """
+        Initialize Time Trap security system with settings
+        """
+        self.settings = settings_manager
+        config = self.settings.settings
+        
+        self.frame_source = config["frame_source"]
+        self.lock_state = LockStateMachine(config["lock_delay"])
+        self._apply_values(config)
+        
+        # Replaceable so recorded footage can be replayed on media time
+        self.clock = time.time
+        self._next_stats_export = 0.0
+        
+        # Per-frame working images live in reused buffers
+        self.buffers = FrameBuffers(depth=2)
+        self.encoding_file = GALLERY_FILE
+        self.legacy_encoding_file = LEGACY_GALLERY_FILE
+        self.log_file = "timetrap_activity.log"
+        
+        for name in self.component_settings:
+            setattr(self, name, getattr(self, '_build_' + name)(config))
+        
+        self.identity_status = None
+        self.identity_face_count = 0
+        self.identity_verified_at = 0.0
+        self.presence_checks = 0
+        self.identity_checks = 0
+        self.faces_encoded = 0
+        self.unauthorized_confirmations = 0
+        self.confirmations_overturned = 0
+        
+        self.gallery = FaceGallery(quantization=config["gallery_quantization"])
+        
+        self.pipeline = None
+        self.pipeline_workers = config["pipeline_workers"]
+        self.recorder = None
+        self.settings_watcher = None
+        
+        self.last_identity = None
+        self.last_distance = None
+        self.last_face_count = 0
+        self.last_encodings = []
+        # What the latest check looked at, for the flight recorder
+        self.last_frame = None
+        self.last_boxes = []
+        self.last_distances = []
+        self.last_path = 'none'
+        self.last_event = None
+        self.returned_at = None
+        self.camera = None
+        self.running = False
+        self.actions = ActionExecutor(create_lock_backend(config["lock_backend"]),
+                                      debounce=config["action_debounce"])
+    
+    def _apply_values(self, config):
+        """Plain settings read on every check"""
+        self.lock_delay = config["lock_delay"]
+        self.lock_state.lock_delay = self.lock_delay
+        self.check_interval = config["check_interval"]
+        self.tolerance = config["tolerance"]
+        self.sound_enabled = config["sound_enabled"]
+        self.log_enabled = config["log_enabled"]
+        self.detector_model = config["detector_model"]
+        self.reverify_interval = config["reverify_interval"]
+        self.returned_window = config["returned_window"]
+        self.suspect_margin = config["suspect_margin"]
+        self.stats_file = config["stats_file"]
+        self.stats_export_format = config["stats_export_format"]
+        self.stats_export_interval = config["stats_export_interval"]
+        self.identity_early_exit = config["identity_early_exit"]
+        self.identity_fast = (config["identity_fast_model"], config["identity_fast_jitters"])
+        self.identity_confirm = (config["identity_confirm_model"],
+                                 config["identity_confirm_jitters"])
+        self.incident_dir = config["incident_dir"]
+    
+    def _build_metrics(self, config):
+        return Instrumentation() if config["stats_enabled"] else None
+    
+    def _build_tracker(self, config):
+        if not config["tracking_enabled"]:
+            return None
+        return FaceTracker(detect_scale=config["detect_scale"],
+                           redetect_interval=config["redetect_interval"],
+                           roi_margin=config["roi_margin"],
+                           model=config["detector_model"],
+                           buffers=self.buffers)
+    
+    def _build_motion_gate(self, config):
+        if not config["motion_gate_enabled"]:
+            return None
+        return MotionGate(threshold=config["motion_threshold"],
+                          max_age=config["max_verdict_age"])
+    
+    def _build_presence_detector(self, config):
+        # Two-tier detection: a cheap detector answers "is anyone there?" and
+        # the dlib identity path only runs when that answer may have changed
+        if not config["two_tier_detection"]:
+            return None
+        try:
+            return create_detector(config["presence_detector"], config["presence_scale"], config)
+        except (ValueError, cv2.error) as e:
+            print(f"⚠️  Presence detector unavailable ({e}) - using dlib for every check")
+            return None
+    
+    def _build_identity_cache(self, config):
+        if not config["identity_cache_enabled"]:
+            return None
+        return IdentityCache(ttl=config["identity_cache_ttl"],
+                             iou_threshold=config["identity_cache_iou"],
+                             max_drift=config["identity_cache_drift"])
+    
+    def _build_scheduler(self, config):
+        if config["adaptive_sampling"]:
+            return AdaptiveScheduler(config["sampling_intervals"],
+                                     backoff=config["sampling_backoff"],
+                                     baseline_interval=config["check_interval"])
+        return AdaptiveScheduler.fixed(config["check_interval"])
+    
+    def _build_logger(self, config):
+        if not config["log_enabled"]:
+            return None
+        return EventLogger(self.log_file,
+                           max_bytes=config["log_max_bytes"],
+                           rotate_daily=config["log_rotate_daily"],
+                           backups=config["log_backups"])
+    
+    def _build_quality_gate(self, config):
+        if not config["quality_gate_enabled"]:
+            return None
+        return FaceQualityGate(min_face_size=config["quality_min_face_size"],
+                               min_brightness=config["quality_min_brightness"],
+                               max_brightness=config["quality_max_brightness"],
+                               min_sharpness=config["quality_min_sharpness"],
+                               max_yaw=config["quality_max_yaw"],
+                               check_pose=config["quality_check_pose"],
+                               max_deferrals=config["quality_max_deferrals"])
+    
+    def _build_flight_recorder(self, config):
+        if not config["flight_recorder_enabled"]:
+            return None
+        return FlightRecorder(capacity=config["flight_recorder_size"])
+    
+    def reload_settings(self):
+        """
+        Apply settings saved while monitoring, between two checks
+        
+        Every component whose settings changed is built first; only if all
+        of them succeed are they swapped in together with the plain values,
+        so the loop never runs on a half-applied configuration.
+        """
+        if self.settings_watcher is None:
+            return
+        config = self.settings_watcher.poll()
+        if config is None:
+            return
+        current = self.settings.settings
+        changed = {key for key in config if config[key] != current.get(key)}
+        # The camera and workers stay as they are until the next start
+        pending_restart = sorted(changed & set(self.restart_settings))
+        for key in self.restart_settings:
+            config[key] = current[key]
+        changed -= set(self.restart_settings)
+        
+        try:
+            rebuilt = {name: getattr(self, '_build_' + name)(config)
+                       for name, keys in self.component_settings.items() if changed & set(keys)}
+            lock_backend = None
+            if "lock_backend" in changed:
+                lock_backend = create_lock_backend(config["lock_backend"])
+        except (OSError, KeyError, ValueError, TypeError) as e:
+            print(f"⚠️  Settings change not applied: {e}")
+            return
+        
+        replaced_logger = self.logger if 'logger' in rebuilt else None
+        replaced_recorder = self.flight_recorder if 'flight_recorder' in rebuilt else None
+        for name, component in rebuilt.items():
+            setattr(self, name, component)
+        self._apply_values(config)
+        if lock_backend is not None:
+            self.actions.lock_backend = lock_backend
+        self.actions.debounce = config["action_debounce"]
+        if "gallery_quantization" in changed:
+            self.gallery.set_quantization(config["gallery_quantization"])
+        if changed & {"tolerance", "two_tier_detection", "presence_detector"}:
+            # Verdicts made under the old settings must be confirmed again
+            self.identity_status = None
+        self.settings.settings = config
+        if replaced_logger is not None:
+            replaced_logger.close()
+        if replaced_recorder is not None:
+            replaced_recorder.wait()
+        
+        current_time = datetime.now().strftime('%H:%M:%S')
+        if changed:
+            print(f"[{current_time}] 🔄 Settings applied: {', '.join(sorted(changed))}")
+            self.log_event("Settings reloaded", 'settings', changed=sorted(changed))
+        if pending_restart:
+            print(f"[{current_time}] ⚙️  Restart to apply: {', '.join(pending_restart)}")
+    
+    def log_event(self, message, event='info', **fields):
+        """Queue a structured event for the background log writer"""
+        if self.logger is not None:
+            self.logger.log(event, message, **fields)
+    
+    def play_sound(self, sound_type='alert'):
+        """Play system sound if sounds are enabled, without waiting for it"""
+        if self.sound_enabled:
+            self.actions.play_sound(sound_type)
+        
+    def lock_system(self):
+        """Lock the screen through the configured backend without blocking the loop"""
+        self.actions.lock(on_done=self._lock_finished)
+    
+    def _lock_finished(self, error):
+        """Report the outcome of a lock (runs on the action thread)"""
+        if error is None:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] 🔒 System locked!")
+            self.log_event("System locked", 'lock')
+            self.play_sound('lock')
+        else:
+            print(f"Error locking system: {error}")
+            self.log_event(f"Error locking system: {error}", 'error')
+    
+    def open_camera(self, threaded=None):
+        """Open the configured frame source (camera, video, image folder or synthetic)"""
+        config = self.settings.settings
+        if threaded is None:
+            threaded = config["threaded_capture"]
+        return open_frame_source(self.frame_source,
+                                 width=config["frame_width"],
+                                 height=config["frame_height"],
+                                 fps=config["frame_fps"],
+                                 buffer_size=config["buffer_size"],
+                                 threaded=threaded)
+    
+    def setup_authorized_user(self, name=None):
+        """Capture a face and enroll it in the authorized gallery"""
+        print("\n" + "="*60)
+        print("TIME TRAP - AUTHORIZED USER SETUP")
+        print("="*60)
+        # Checked before capturing, since the template store rejects longer names
+        while name is None or len(name.encode('utf-8')) > TemplateStore.name_bytes:
+            if name is not None:
+                print(f"❌ Names can be at most {TemplateStore.name_bytes} bytes long")
+            default_name = getpass.getuser()
+            name = input(f"\n👤 Name for this face [{default_name}]: ").strip() or default_name
+        print("\n📸 Starting camera for face registration...")
+        print("Please position your face clearly in front of the camera.")
+        print("Press SPACE when ready to capture your face.")
+        print("Press ESC to cancel.\n")
+        
+        self.camera = self.open_camera()
+        if not self.camera.isOpened():
+            print("❌ Error: Could not access camera!")
+            return False
+        
+        config = self.settings.settings
+        captured = False
+        face_locations = []
+        frame_count = 0
+        burst = None
+        while True:
+            ret, frame = self.camera.read()
+            if not ret:
+                print("❌ Failed to grab frame")
+                break
+            frame_count += 1
+            
+            # Preview detection runs on a small frame and not on every frame;
+            # during a burst every frame is checked
+            rgb_frame = None
+            if burst is not None or frame_count % config["enroll_detect_every"] == 0:
+                rgb_frame = self.buffers.convert(frame, cv2.COLOR_BGR2RGB, 'rgb')
+                face_locations = locate_faces(rgb_frame, config["enroll_preview_scale"],
+                                              self.detector_model, buffers=self.buffers)
+            
+            if burst is not None:
+                if len(face_locations) == 1:
+                    reason = self._collect_enrollment_sample(rgb_frame, face_locations[0], burst)
+                    if reason is not None:
+                        burst["rejected"][reason] += 1
+                elapsed = time.time() - burst["started"]
+                if (len(burst["samples"]) >= config["enroll_burst_frames"] or
+                        elapsed >= config["enroll_burst_seconds"]):
+                    if self._finish_enrollment(name, burst):
+                        captured = True
+                        time.sleep(1)
+                        break
+                    burst = None
+            
+            # Flip frame for mirror effect (boxes are mirrored to match)
+            width = frame.shape[1]
+            display = cv2.flip(frame, 1, dst=self.buffers.get('display', frame.shape))
+            for (top, right, bottom, left) in face_locations:
+                cv2.rectangle(display, (width - right, top), (width - left, bottom), (0, 255, 0), 2)
+                cv2.putText(display, "Face Detected", (width - right, top - 10),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            
+            # Display instructions
+            if burst is not None:
+                cv2.putText(display, f"Slowly turn your head... {len(burst['samples'])}/"
+                            f"{config['enroll_burst_frames']}", (10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+            else:
+                cv2.putText(display, "Press SPACE to capture", (10, 30),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            cv2.putText(display, "Press ESC to cancel", (10, 60),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            
+            cv2.imshow("Time Trap - Setup", display)
+            
+            key = cv2.waitKey(1) & 0xFF
+            if key == 27:  # ESC
+                print("\n❌ Setup cancelled")
+                break
+            elif key == 32 and burst is None and len(face_locations) > 0:  # SPACE
+                print("\n📷 Capturing - slowly turn your head left and right...")
+                burst = {"started": time.time(), "samples": [],
+                         "rejected": collections.Counter()}
+            elif key == 32 and burst is None and len(face_locations) == 0:
+                print("⚠️  No face detected. Please position yourself properly.")
+        
+        self.camera.release()
+        cv2.destroyAllWindows()
+        return captured
+    
+    def _collect_enrollment_sample(self, rgb_frame, box, burst):
+        """
+        Encode one burst frame unless it is blurry or a near duplicate
+        
+        Returns the rejection reason, or None if the sample was kept.
+        """
+        config = self.settings.settings
+        top, right, bottom, left = box
+        gray_face = cv2.cvtColor(rgb_frame[max(0, top):bottom, max(0, left):right],
+                                 cv2.COLOR_RGB2GRAY)
+        if gray_face.size == 0 or laplacian_sharpness(gray_face) < config["enroll_blur_threshold"]:
+            return 'blurry'
+        
+        encodings = face_recognition.face_encodings(rgb_frame, [box])
+        if not encodings:
+            return 'unencodable'
+        encoding = encodings[0]
+        if burst["samples"]:
+            distances = np.linalg.norm(np.asarray(burst["samples"]) - encoding, axis=1)
+            if distances.min() < config["enroll_duplicate_distance"]:
+                return 'duplicate'
+        burst["samples"].append(encoding)
+        return None
+    
+    def _finish_enrollment(self, name, burst):
+        """Store a template built from the burst, or report why it failed"""
+        config = self.settings.settings
+        samples, rejected = burst["samples"], burst["rejected"]
+        skipped = ", ".join(f"{count} {reason}" for reason, count in rejected.items())
+        if len(samples) < config["enroll_min_samples"]:
+            print(f"❌ Only {len(samples)} good samples{f' (skipped {skipped})' if skipped else ''}. "
+                  f"Press SPACE to try again.")
+            return False
+        
+        template = build_face_template(samples, config["enroll_exemplars"])
+        self._migrate_gallery()
+        if TemplateStore.is_store(self.encoding_file):
+            # Only this identity's records change; everyone else stays as stored
+            TemplateStore(self.encoding_file).replace_identity(name, template)
+            self.gallery.load(self.encoding_file)
+        else:
+            if os.path.exists(self.encoding_file):
+                # Never parse it; keep it aside rather than silently overwriting it
+                os.replace(self.encoding_file, self.encoding_file + ".invalid")
+                print(f"⚠️ {self.encoding_file} is not a template store; "
+                      f"moved it to {self.encoding_file}.invalid")
+            self.gallery.add_identity(name, template)
+            self.gallery.save(self.encoding_file)
+        print(f"✅ Face captured and saved successfully for {name}! "
+              f"({len(samples)} samples, {len(template)} stored encodings"
+              f"{f', skipped {skipped}' if skipped else ''})")
+        self.log_event(f"Authorized user registered: {name}", 'registered',
+                       identity=name, samples=len(samples), encodings=len(template))
+        return True
+    
+    def _migrate_gallery(self):
+        """Convert a pickled gallery left by an older version, once"""
+        migrated = migrate_legacy_gallery(self.encoding_file, self.legacy_encoding_file,
+                                          self.gallery.quantization)
+        if migrated is not None:
+            self.log_event(f"Gallery migrated to {self.encoding_file}", 'migrated',
+                           identities=len(migrated.names), encodings=len(migrated))
+    
+    def load_authorized_user(self):
+        """Load the authorized gallery from file"""
+        self._migrate_gallery()
+        if os.path.exists(self.encoding_file):
+            try:
+                self.gallery.load(self.encoding_file)
+            except ValueError as e:
+                print(f"❌ Could not load the authorized gallery: {e}")
+                return False
+            if len(self.gallery) == 0:
+                return False
+            print(f"✅ Authorized profiles loaded: {', '.join(self.gallery.names)}")
+            return True
+        return False
+    
+    def check_for_face(self):
+        """
+        Check camera for faces and determine if authorized user is present
+        
+        Returns:
+            'authorized' - Authorized user detected
+            'unauthorized' - Unknown person detected
+            'absent' - No person detected
+            None - No verdict this check (e.g. every face failed the quality gate)
+        """
+        if self.pipeline is not None:
+            return self.check_pipeline_result()
+        
+        with self._stage('read'):
+            ret, frame = self.camera.read()
+        if self.metrics is not None:
+            self.metrics.count('frames' if ret else 'read_failures')
+        if not ret:
+            self.last_frame, self.last_path = None, 'none'
+            return 'absent'
+        self.last_frame = frame
+        
+        # Reuse the last verdict while nothing in the scene has moved
+        if self.motion_gate is not None:
+            with self._stage('motion'):
+                cached = self.motion_gate.check(frame, self.clock())
+            if cached is not None:
+                self.last_path = 'motion'
+                return cached
+        
+        status = self.classify_frame(frame)
+        if self.motion_gate is not None and status is not None:
+            self.motion_gate.update(status, self.clock())
+        return status
+    
+    def _stage(self, name):
+        """Time a stage when instrumentation is enabled"""
+        if self.metrics is None:
+            return _NO_STAGE
+        return self.metrics.stage(name)
+    
+    def component_counters(self):
+        """Counters kept by the individual components, for stats export"""
+        counters = {"dropped_frames": getattr(self.camera, 'dropped', 0),
+                    "rss_mb": round(resident_memory_bytes() / 2 ** 20, 1),
+                    "buffer_allocations": self.buffers.allocations,
+                    "buffer_mb": round(self.buffers.nbytes / 2 ** 20, 1)}
+        if self.motion_gate is not None:
+            counters["motion_skipped"] = self.motion_gate.skipped
+            counters["motion_passed"] = self.motion_gate.passed
+        if self.tracker is not None:
+            counters["full_detections"] = self.tracker.full_detections
+            counters["roi_searches"] = self.tracker.roi_searches
+        counters["faces_encoded"] = self.faces_encoded
+        counters["unauthorized_confirmations"] = self.unauthorized_confirmations
+        counters["confirmations_overturned"] = self.confirmations_overturned
+        if self.flight_recorder is not None:
+            counters["flight_recorder_mb"] = round(self.flight_recorder.nbytes / 2 ** 20, 1)
+        if self.quality_gate is not None:
+            for reason in FaceQualityGate.reasons:
+                counters[f"quality_skipped_{reason}"] = self.quality_gate.skipped[reason]
+            counters["quality_forced"] = self.quality_gate.forced
+        if self.presence_detector is not None:
+            counters["presence_checks"] = self.presence_checks
+            counters["identity_checks"] = self.identity_checks
+        if self.identity_cache is not None:
+            counters["identity_cache_hits"] = self.identity_cache.hits
+            counters["identity_cache_misses"] = self.identity_cache.misses
+        if self.pipeline is not None:
+            counters["pipeline_completed"] = self.pipeline.completed
+            counters["pipeline_dropped"] = self.pipeline.dropped
+            counters["pipeline_errors"] = self.pipeline.errors
+        counters["effective_check_rate"] = round(self.scheduler.stats()["rate"], 3)
+        return counters
+    
+    def export_stats(self, force=False):
+        """Write the stats file every stats_export_interval seconds"""
+        if self.metrics is None:
+            return
+        now = time.time()
+        if not force and now < self._next_stats_export:
+            return
+        self._next_stats_export = now + self.stats_export_interval
+        try:
+            self.metrics.export(self.stats_file, self.stats_export_format,
+                                self.component_counters())
+        except OSError as e:
+            print(f"⚠️  Could not export stats: {e}")
+    
+    def check_pipeline_result(self):
+        """Turn the next in-order result from the process pool into a verdict"""
+        result = self.pipeline.get()
+        self.last_frame, self.last_path = None, 'pipeline'
+        self.last_boxes, self.last_distances = [], []
+        if result is None:
+            # Workers still loading models, or busy - no verdict this tick
+            return None
+        if self.metrics is not None:
+            self.metrics.count('frames')
+            self.metrics.record('pipeline', result["latency"])
+        if not result["boxes"]:
+            self.last_face_count = 0
+            self.last_distance = None
+            self.last_encodings = []
+            return 'absent'
+        self.last_face_count = len(result["boxes"])
+        self.last_boxes, self.last_distances = result["boxes"], list(result["distances"])
+        self.last_encodings = result["encodings"]
+        for name, distance in zip(result["names"], result["distances"]):
+            if distance <= self.tolerance:
+                self.last_identity, self.last_distance = name, distance
+                return 'authorized'
+        return 'unauthorized'
+    
+    @property
+    def stream_finished(self):
+        """True once recorded footage has been played to the end"""
+        if self.pipeline is not None:
+            return self.pipeline.exhausted
+        return self.camera.exhausted
+    
+    def classify_frame(self, frame):
+        """Run detection and recognition on a single BGR frame"""
+        if self.presence_detector is None:
+            return self.identify_faces(self.to_rgb(frame))
+        
+        # The presence detector downscales before converting, so most checks
+        # never touch a full-resolution RGB copy
+        with self._stage('presence'):
+            boxes = self.presence_detector.detect(frame, cv2.COLOR_BGR2RGB)
+        self.presence_checks += 1
+        self.last_path, self.last_boxes, self.last_distances = 'presence', boxes, []
+        if not boxes:
+            self.identity_status = None
+            self.last_face_count = 0
+            self.last_distance = None
+            self.last_encodings = []
+            return 'absent'
+        
+        # Same people still in view and verified recently - skip dlib entirely
+        now = self.clock()
+        if (self.identity_status == 'authorized' and len(boxes) == self.identity_face_count and
+                now - self.identity_verified_at < self.reverify_interval):
+            self.last_face_count = len(boxes)
+            return 'authorized'
+        
+        self.identity_checks += 1
+        status = self.identify_faces(self.to_rgb(frame))
+        if status is None:
+            # Nothing was verified - try again on the next frame
+            return None
+        self.identity_status = status
+        self.identity_face_count = len(boxes)
+        self.identity_verified_at = now
+        return status
+    
+    def to_rgb(self, frame):
+        """Convert to RGB for face_recognition, into a reused buffer"""
+        with self._stage('convert'):
+            return self.buffers.convert(frame, cv2.COLOR_BGR2RGB, 'rgb')
+    
+    def identify_faces(self, rgb_frame):
+        """dlib detection, encoding and gallery matching on an RGB frame"""
+        # Detect faces (or follow them between periodic detections)
+        with self._stage('detect'):
+            if self.tracker is not None:
+                face_locations = self.tracker.locate(rgb_frame)
+            else:
+                face_locations = locate_faces(rgb_frame, model=self.detector_model,
+                                              buffers=self.buffers)
+        
+        self.last_face_count = len(face_locations)
+        self.last_distance = None
+        self.last_encodings = []
+        # One distance slot per detected box, filled in as faces are matched
+        self.last_path, self.last_boxes = 'identity', face_locations
+        self.last_distances = [float('nan')] * len(face_locations)
+        if len(face_locations) == 0:
+            return 'absent'
+        
+        # Reuse identities of faces that have not moved since they were encoded
+        if self.identity_cache is not None:
+            now = self.clock()
+            to_encode = []
+            for box in face_locations:
+                cached = self.identity_cache.lookup(box, now)
+                if cached is not None and cached[1] <= self.tolerance:
+                    self.last_identity, self.last_distance, encoding = cached
+                    self.last_encodings = [encoding]
+                    self.last_path = 'cached'
+                    self._note_distance(box, self.last_distance)
+                    return 'authorized'
+                to_encode.append(box)
+            face_locations = to_encode
+        
+        # Only spend an encoding on faces that are sharp, lit, large and frontal
+        # enough; otherwise keep the previous verdict until a better frame
+        if self.quality_gate is not None:
+            with self._stage('quality'):
+                selected = self.quality_gate.select(rgb_frame, face_locations)
+            if selected is None:
+                self.last_path = 'deferred'
+                return None
+            face_locations = selected
+        
+        if self.identity_early_exit:
+            ranked = rank_faces(face_locations, rgb_frame.shape)
+            match = self._match_ranked(rgb_frame, ranked, *self.identity_fast)
+            if match is None:
+                # An unauthorized verdict locks at once, so confirm it at full quality
+                self.unauthorized_confirmations += 1
+                # The full-quality encodings replace the routine ones
+                self.last_encodings = []
+                with self._stage('confirm'):
+                    match = self._match_ranked(rgb_frame, ranked, *self.identity_confirm)
+                if match is not None:
+                    self.confirmations_overturned += 1
+        else:
+            # Get face encodings
+            with self._stage('encode'):
+                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+            self.faces_encoded += len(face_encodings)
+            self.last_encodings = face_encodings
+            
+            # Match every face against the whole gallery in one batch
+            with self._stage('match'):
+                names, distances = self.gallery.match(face_encodings)
+            for box, distance in zip(face_locations, distances):
+                self._note_distance(box, float(distance))
+            match = None
+            for box, encoding, name, distance in zip(face_locations, face_encodings, names,
+                                                     distances):
+                if distance <= self.tolerance:
+                    match = (box, encoding, name, float(distance))
+                    break
+        
+        if match is None:
+            return 'unauthorized'
+        box, encoding, self.last_identity, self.last_distance = match
+        if self.identity_cache is not None:
+            self.identity_cache.store(box, self.last_identity, self.last_distance, encoding,
+                                      self.clock())
+        return 'authorized'
+    
+    def _match_ranked(self, rgb_frame, boxes, model, jitters):
+        """
+        Encode faces one at a time in the given order, stopping at the
+        first within tolerance
+        
+        Returns (box, encoding, name, distance) or None if no face matched.
+        """
+        for box in boxes:
+            with self._stage('encode'):
+                encodings = face_recognition.face_encodings(rgb_frame, [box],
+                                                            num_jitters=jitters, model=model)
+            if not encodings:
+                continue
+            self.faces_encoded += 1
+            self.last_encodings.append(encodings[0])
+            with self._stage('match'):
+                names, distances = self.gallery.match(encodings)
+            self._note_distance(box, float(distances[0]))
+            if distances[0] <= self.tolerance:
+                return box, encodings[0], names[0], float(distances[0])
+        return None
+    
+    def _note_distance(self, box, distance):
+        """Keep a match distance in the slot of the box it belongs to"""
+        self.last_distances[self.last_boxes.index(box)] = distance
+    
+    def sampling_state(self, status):
+        """Map the latest verdict onto an AdaptiveScheduler state"""
+        if status is None or status == 'unauthorized' or self.last_face_count > 1:
+            return 'suspect'
+        if status == 'authorized':
+            if (self.last_distance is not None and
+                    self.last_distance > self.tolerance - self.suspect_margin):
+                # Barely matched - keep a close eye on it
+                return 'suspect'
+            if self.returned_at is not None and self.clock() - self.returned_at < self.returned_window:
+                return 'returned'
+            return 'stable'
+        if self.user_absent_since is not None:
+            return 'countdown'
+        return 'stable'
+    
+    @property
+    def user_absent_since(self):
+        return self.lock_state.absent_since
+    
+    @user_absent_since.setter
+    def user_absent_since(self, value):
+        self.lock_state.absent_since = value
+    
+    def handle_status(self, status):
+        """Apply one verdict to the absence countdown and lock decisions"""
+        now = self.clock()
+        current_time = datetime.now().strftime('%H:%M:%S')
+        event = self.lock_state.step(status, now)
+        # One incident file per run of consecutive locks
+        previous_event, self.last_event = self.last_event, event
+        
+        if event == 'returned':
+            print(f"[{current_time}] ✅ Authorized user returned")
+            self.log_event("Authorized user returned", 'returned',
+                           identity=self.last_identity)
+            self.returned_at = now
+            
+        elif event == 'absent_started':
+            print(f"[{current_time}] ⚠️  User absent - lock countdown started")
+            self.log_event("User absent - countdown started", 'absent')
+            self.play_sound('alert')
+        
+        elif event == 'countdown':
+            print(f"[{current_time}] ⏳ Locking in {int(self.lock_state.remaining(now))} seconds...")
+        
+        elif event == 'lock_absent':
+            print(f"[{current_time}] 🔒 Lock delay exceeded - locking system")
+            self.lock_system()
+            if previous_event != event:
+                self.save_incident('absent')
+        
+        elif event == 'lock_unauthorized':
+            print(f"[{current_time}] 🚨 UNAUTHORIZED USER DETECTED - LOCKING IMMEDIATELY")
+            self.log_event("UNAUTHORIZED USER DETECTED - System locked", 'unauthorized',
+                           distance=self.last_distance, faces=self.last_face_count)
+            self.play_sound('alert')
+            self.lock_system()
+            if previous_event != event:
+                self.save_incident('unauthorized')
+    
+    def record_check(self, status):
+        """Keep the latest check in the flight recorder"""
+        timings = self.metrics.last if self.metrics is not None else {}
+        self.flight_recorder.record(self.clock(), status, self.last_path, self.last_frame,
+                                    self.last_boxes, self.last_distances, timings)
+    
+    def save_incident(self, reason):
+        """Write the checks that led up to a lock to an incident file"""
+        if self.flight_recorder is None or self.flight_recorder.count == 0:
+            return
+        try:
+            path = self.flight_recorder.dump(self.incident_dir, reason, metadata={
+                "tolerance": self.tolerance, "lock_delay": self.lock_delay,
+                "identity": self.last_identity, "distance": self.last_distance})
+        except OSError as e:
+            print(f"⚠️  Could not save incident: {e}")
+            return
+        print(f"🧾 Incident saved to {path} (replay with --replay-incident)")
+        self.log_event(f"Incident saved to {path}", 'incident', reason=reason, path=path)
+    
+    def run(self):
+        """Main monitoring loop"""
+        print("\n" + "="*60)
+        print("TIME TRAP - ACTIVE MONITORING")
+        print("="*60)
+        print(f"⚙️  Lock delay: {self.lock_delay} seconds")
+        print(f"⚙️  Check interval: {self.check_interval} seconds"
+              f"{' (adaptive)' if self.settings.settings['adaptive_sampling'] else ''}")
+        print(f"⚙️  Face match tolerance: {self.tolerance}")
+        if self.presence_detector is not None:
+            print(f"⚙️  Detection: {self.presence_detector.name} presence, "
+                  f"{self.detector_model} identity every {self.reverify_interval}s")
+        print(f"⚙️  Sound alerts: {'Enabled' if self.sound_enabled else 'Disabled'}")
+        print(f"⚙️  Activity logging: {'Enabled' if self.log_enabled else 'Disabled'}")
+        print("🟢 Monitoring started. Press Ctrl+C to stop.\n")
+        
+        self.log_event("Monitoring started", 'monitor_start')
+        
+        self.camera = self.open_camera()
+        if not self.camera.isOpened():
+            print("❌ Error: Could not access camera!")
+            return
+        
+        self.running = True
+        self.user_absent_since = None
+        if self.tracker is not None:
+            self.tracker.reset()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        if self.identity_cache is not None:
+            self.identity_cache.reset()
+        self.identity_status = None
+        config = self.settings.settings
+        if self.pipeline_workers > 0:
+            self.pipeline = InferencePipeline(self.camera, self.gallery,
+                                              workers=self.pipeline_workers,
+                                              queue_size=config["pipeline_queue_size"],
+                                              detect_scale=config["detect_scale"],
+                                              model=self.detector_model).start()
+            print(f"⚙️  Inference pipeline: {self.pipeline_workers} worker processes")
+        if config["settings_hot_reload"]:
+            self.settings_watcher = SettingsWatcher(self.settings,
+                                                    config["settings_poll_interval"])
+        if config["record_sessions"]:
+            self.recorder = SessionRecorder(config["session_dir"], metadata={
+                "tolerance": self.tolerance, "lock_delay": self.lock_delay,
+                "check_interval": self.check_interval})
+            print(f"⚙️  Recording session to {self.recorder.base}_part*.npz")
+        
+        try:
+            while self.running:
+                status = self.check_for_face()
+                if self.pipeline is not None and self.pipeline.failure is not None:
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] ❌ Inference pipeline "
+                          f"failed - monitoring stopped")
+                    self.log_event("Inference pipeline failed", 'error',
+                                   error=str(self.pipeline.failure))
+                    break
+                if self.stream_finished:
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] 🎞️  End of recorded footage")
+                    self.log_event("Frame source exhausted", 'monitor_stop')
+                    break
+                
+                if self.flight_recorder is not None:
+                    self.record_check(status)
+                # A check without a verdict leaves the lock state untouched
+                if status is not None:
+                    self.handle_status(status)
+                    if self.recorder is not None:
+                        self.recorder.record(self.clock(), status, self.last_face_count,
+                                             self.last_encodings)
+                
+                if self.metrics is not None:
+                    self.metrics.tick()
+                    self.export_stats()
+                
+                # Settings saved meanwhile take effect before the next check
+                self.reload_settings()
+                
+                # Pipeline mode paces itself on results; otherwise sleep per state,
+                # but never past the moment the countdown expires
+                if self.pipeline is None:
+                    limit = self.lock_state.remaining(self.clock())
+                    self.scheduler.wait(self.sampling_state(status), limit)
+                
+        except KeyboardInterrupt:
+            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] 🛑 Monitoring stopped by user")
+            self.log_event("Monitoring stopped by user", 'monitor_stop')
+        finally:
+            # Let a lock that is still queued go through before exiting
+            self.actions.drain()
+            if self.flight_recorder is not None:
+                self.flight_recorder.wait()
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None
+            self.export_stats(force=True)
+            if self.pipeline is not None:
+                print(f"📈 Pipeline: {self.pipeline.completed} frames processed, "
+                      f"{self.pipeline.dropped} dropped, {self.pipeline.errors} errors")
+                self.pipeline.stop()
+                self.pipeline = None
+            self.camera.release()
+            if self.identity_cache is not None:
+                stats = self.identity_cache.stats()
+                print(f"📈 Identity cache: {stats['hits']} hits, {stats['misses']} misses, "
+                      f"{stats['expired']} expired ({stats['hit_rate']:.0%} hit rate)")
+            if self.quality_gate is not None and self.quality_gate.skipped:
+                skipped = ", ".join(f"{count} {reason}" for reason, count in
+                                    self.quality_gate.skipped.most_common())
+                print(f"📈 Quality gate skipped faces: {skipped} "
+                      f"({self.quality_gate.forced} encoded anyway after repeated deferrals)")
+            if self.presence_checks:
+                print(f"📈 Two-tier detection: {self.presence_checks} presence checks, "
+                      f"dlib identity path on {self.identity_checks}")
+            stats = self.scheduler.stats()
+            if stats["ticks"]:
+                print(f"📈 Sampling: {stats['rate']:.2f} checks/s "
+                      f"(fixed interval would be {stats['baseline_rate']:.2f}/s), "
+                      f"~{stats['cpu_saved']:.1f}s CPU saved")
+            print("👋 Time Trap shutdown complete")
+    
+    def start(self):
+        """Initialize and start Time Trap"""
+        print("\n" + "="*60)
+        print("  _____ ___ __  __ _____   _____ ____      _    ____  ")
+        print(" |_   _|_ _|  \\/  | ____| |_   _|  _ \\    / \\  |  _ \\ ")
+        print("   | |  | || |\\/| |  _|     | | | |_) |  / _ \\ | |_) |")
+        print("   | |  | || |  | | |___    | | |  _ <  / ___ \\|  __/ ")
+        print("   |_| |___|_|  |_|_____|   |_| |_| \\_\\/_/   \\_\\_|    ")
+
+        print("    ")
+        print("                                          MADE BY REDEYES(ANUPOM)")
+        print("="*60)
+        print("Smart PC Lock System with Face Recognition")
+        print("="*60 + "\n")
+        
+        # Check if authorized user exists
+        if not self.load_authorized_user():
+            print("⚠️  No authorized user found. Starting setup...\n")
+            if not self.setup_authorized_user():
+                print("\n❌ Setup failed. Exiting.")
+                return
+        
+        print("\n✅ System ready!")
+        
+        # Check if auto-start is enabled
+        if self.settings.settings.get("auto_start", False):
+            print("🚀 Auto-start enabled. Starting monitoring in 3 seconds...")
+            time.sleep(3)
+        else:
+            input("Press ENTER to start monitoring...")
+        
+        self.run()
+
+
+class StreamMonitor:
+    """One camera stream in daemon mode: its source, lock state and lock action"""
+    
+    def __init__(self, name, camera, lock_delay, tolerance, check_interval, actions,
+                 logger=None):
+        self.name = name
+        self.camera = camera
+        self.tolerance = tolerance
+        self.check_interval = check_interval
+        self.actions = actions
+        self.logger = logger
+        self.lock_state = LockStateMachine(lock_delay)
+        self.next_check = 0.0
+        self.busy = False
+        self.finished = False
+        self.checks = 0
+        self.locks = 0
+        self.latency_total = 0.0
+        self.cpu_seconds = 0.0
+    
+    def log_event(self, message, event='info', **fields):
+        if self.logger is not None:
+            self.logger.log(event, message, stream=self.name, **fields)
+    
+    def classify(self, boxes, distances):
+        if not boxes:
+            return 'absent'
+        if any(distance <= self.tolerance for distance in distances):
+            return 'authorized'
+        return 'unauthorized'
+    
+    def handle_status(self, status, now):
+        """Same countdown and lock rules as TimeTrap.handle_status, without sounds"""
+        current_time = datetime.now().strftime('%H:%M:%S')
+        event = self.lock_state.step(status, now)
+        if event == 'returned':
+            print(f"[{current_time}] [{self.name}] ✅ Authorized user returned")
+            self.log_event("Authorized user returned", 'returned')
+        elif event == 'absent_started':
+            print(f"[{current_time}] [{self.name}] ⚠️  User absent - lock countdown started")
+            self.log_event("User absent - countdown started", 'absent')
+        elif event in ('lock_absent', 'lock_unauthorized'):
+            if event == 'lock_unauthorized':
+                print(f"[{current_time}] [{self.name}] 🚨 UNAUTHORIZED USER DETECTED - LOCKING")
+                self.log_event("UNAUTHORIZED USER DETECTED - System locked", 'unauthorized')
+            else:
+                print(f"[{current_time}] [{self.name}] 🔒 Lock delay exceeded - locking")
+            self.locks += 1
+            self.actions.lock(on_done=self._lock_finished)
+    
+    def _lock_finished(self, error):
+        if error is None:
+            self.log_event("System locked", 'lock')
+        else:
+            print(f"[{self.name}] ❌ Error locking system: {error}")
+            self.log_event(f"Lock failed: {error}", 'error')
+
+
+class MonitorDaemon:
+    """
+    Headless monitoring of several camera streams on one inference pool
+    
+    Every stream keeps its own frame source, LockStateMachine and lock
+    action, while one process pool (each worker holding the dlib models and
+    the gallery once) serves them all. Streams are dispatched round-robin
+    with at most one frame in flight each, so a busy stream can never
+    starve the others and an overloaded machine slows all streams evenly.
+    """
+    
+    def __init__(self, settings_manager, config):
+        base = settings_manager.settings
+        self.workers = config.get("workers") or base["pipeline_workers"] or os.cpu_count() or 1
+        self.max_in_flight = self.workers * 2
+        self.report_interval = config.get("report_interval", 30.0)
+        self.stats_file = base["stats_file"]
+        self.stats_export_format = base["stats_export_format"]
+        self.metrics = Instrumentation()
+        self.running = False
+        self.in_flight = 0
+        self.errors = 0
+        self._cursor = 0
+        self._done = queue.Queue()
+        # A pool whose worker was killed is replaced up to pool_restarts times
+        self.pool_restarts = config.get("pool_restarts", 3)
+        self.restarts = 0
+        self.generation = 0
+        self.failure = None
+        
+        gallery_file = config.get("gallery", GALLERY_FILE)
+        if gallery_file == GALLERY_FILE:
+            migrate_legacy_gallery(quantization=base["gallery_quantization"])
+        gallery = FaceGallery(quantization=base["gallery_quantization"])
+        if os.path.exists(gallery_file):
+            gallery.load(gallery_file)
+        if len(gallery) == 0:
+            raise ValueError(f"no authorized faces in {gallery_file} - register one first")
+        
+        self.logger = None
+        if base["log_enabled"]:
+            self.logger = EventLogger(config.get("log_file", "timetrap_activity.log"),
+                                      max_bytes=base["log_max_bytes"],
+                                      rotate_daily=base["log_rotate_daily"],
+                                      backups=base["log_backups"])
+        
+        self.streams = []
+        for index, spec in enumerate(config["streams"]):
+            name = spec.get("name", f"stream{index}")
+            camera = open_frame_source(spec["source"],
+                                       width=spec.get("frame_width", base["frame_width"]),
+                                       height=spec.get("frame_height", base["frame_height"]),
+                                       fps=spec.get("frame_fps", base["frame_fps"]),
+                                       buffer_size=base["buffer_size"],
+                                       threaded=True, loop=spec.get("loop", False))
+            if not camera.isOpened():
+                raise ValueError(f"could not open source {spec['source']!r} for {name}")
+            # Never wait on one stream's camera while others are due
+            camera.timeout = 0.0
+            if "lock_command" in spec:
+                backend = CommandLockBackend(spec["lock_command"])
+            else:
+                backend = create_lock_backend(spec.get("lock_backend", base["lock_backend"]))
+            self.streams.append(StreamMonitor(
+                name, camera,
+                lock_delay=spec.get("lock_delay", base["lock_delay"]),
+                tolerance=spec.get("tolerance", base["tolerance"]),
+                check_interval=spec.get("check_interval", base["check_interval"]),
+                actions=ActionExecutor(backend, debounce=base["action_debounce"]),
+                logger=self.logger))
+        
+        self._pool_args = (gallery.names, gallery.labels, gallery.encodings,
+                           gallery.quantization, base["detect_scale"], base["detector_model"])
+        self.pool = self._start_pool()
+    
+    def _start_pool(self):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_inference_worker,
+            initargs=self._pool_args)
+    
+    def _pool_broken(self, error):
+        """Replace a dead worker pool, or stop every stream once out of restarts"""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        # Frames in flight on the dead pool are given up
+        self.generation += 1
+        self.in_flight = 0
+        for stream in self.streams:
+            stream.busy = False
+        print(f"❌ Inference pool died: {error}")
+        if self.logger is not None:
+            self.logger.log('error', "Inference pool died", error=str(error),
+                            restarts=self.restarts)
+        if self.restarts >= self.pool_restarts:
+            print(f"❌ Giving up after {self.restarts} pool restarts - stopping all streams")
+            self.failure = error
+            self.running = False
+            return
+        self.restarts += 1
+        self.pool = self._start_pool()
+        print(f"🔁 Inference pool restarted ({self.restarts}/{self.pool_restarts})")
+    
+    def _dispatch(self, now):
+        """Submit due streams round-robin, starting after the last one served"""
+        count = len(self.streams)
+        start = self._cursor
+        for offset in range(count):
+            if self.in_flight >= self.max_in_flight:
+                return
+            index = (start + offset) % count
+            stream = self.streams[index]
+            if stream.busy or stream.finished or now < stream.next_check:
+                continue
+            ret, frame = stream.camera.read()
+            if not ret:
+                if stream.camera.exhausted:
+                    stream.finished = True
+                continue
+            # The frame buffer is reused only after this stream's result is
+            # back, by which time the pool has long since pickled it
+            stream.busy = True
+            stream.next_check = now + stream.check_interval
+            self.in_flight += 1
+            self._cursor = index + 1
+            try:
+                future = self.pool.submit(_infer_frame_timed, frame)
+            except concurrent.futures.process.BrokenProcessPool as e:
+                self._pool_broken(e)
+                return
+            future.add_done_callback(
+                lambda f, stream=stream, captured_at=time.time(), generation=self.generation:
+                    self._done.put((stream, captured_at, f, generation)))
+    
+    def _finish(self, stream, captured_at, future, generation):
+        """Apply one finished inference to its stream's state machine"""
+        if generation != self.generation:
+            # Submitted to a pool that has since died and been replaced
+            return
+        self.in_flight -= 1
+        stream.busy = False
+        try:
+            (boxes, names, distances, encodings), cpu_seconds = future.result()
+        except concurrent.futures.process.BrokenProcessPool as e:
+            self._pool_broken(e)
+            return
+        except Exception as e:
+            self.errors += 1
+            print(f"[{stream.name}] ⚠️  Inference failed: {e}")
+            return
+        now = time.time()
+        latency = now - captured_at
+        stream.checks += 1
+        stream.latency_total += latency
+        stream.cpu_seconds += cpu_seconds
+        self.metrics.record('inference', latency)
+        self.metrics.tick()
+        stream.handle_status(stream.classify(boxes, distances), now)
+    
+    def throughput(self):
+        """Aggregate and per-stream throughput, plus how many streams fit on this machine"""
+        elapsed = max(time.time() - self.metrics.started, 1e-9)
+        checks = sum(stream.checks for stream in self.streams)
+        cpu_seconds = sum(stream.cpu_seconds for stream in self.streams)
+        per_core = checks / cpu_seconds if cpu_seconds else 0.0
+        # Each stream asks for one check per check_interval
+        demand = sum(1.0 / max(stream.check_interval, 1e-3) for stream in self.streams)
+        demand /= len(self.streams)
+        return {
+            "checks_per_second": checks / elapsed,
+            "checks_per_core_second": per_core,
+            "workers": self.workers,
+            "cpu_count": os.cpu_count() or 1,
+            "stream_capacity": per_core * (os.cpu_count() or 1) / demand if demand else 0.0,
+            "streams": {stream.name: {"checks": stream.checks,
+                                      "checks_per_second": stream.checks / elapsed,
+                                      "mean_latency_ms": 1000.0 * stream.latency_total /
+                                      stream.checks if stream.checks else 0.0,
+                                      "locks": stream.locks,
+                                      "dropped_frames": getattr(stream.camera, 'dropped', 0)}
+                        for stream in self.streams},
+        }
+    
+    def report(self):
+        stats = self.throughput()
+        print(f"📊 {stats['checks_per_second']:.1f} checks/s across {len(self.streams)} streams "
+              f"on {stats['workers']} workers | {stats['checks_per_core_second']:.1f} checks per "
+              f"core-second | room for ~{stats['stream_capacity']:.0f} streams on "
+              f"{stats['cpu_count']} cores")
+        for name, stream in stats["streams"].items():
+            print(f"   {name:<16}{stream['checks_per_second']:>7.2f}/s "
+                  f"{stream['mean_latency_ms']:>8.1f} ms  {stream['locks']} locks  "
+                  f"{stream['dropped_frames']} dropped")
+        counters = {"inference_errors": self.errors,
+                    "checks_per_core_second": round(stats["checks_per_core_second"], 3),
+                    "stream_capacity": round(stats["stream_capacity"], 1)}
+        # Stream names are free text, so they go in a label rather than the metric name
+        series = {f"stream_{key}": {"label": "stream",
+                                    "values": {name: stream[key]
+                                               for name, stream in stats["streams"].items()}}
+                  for key in ("checks", "locks")}
+        try:
+            self.metrics.export(self.stats_file, self.stats_export_format, counters, series)
+        except OSError as e:
+            print(f"⚠️  Could not export stats: {e}")
+    
+    def stop(self, *args):
+        self.running = False
+    
+    def run(self):
+        print(f"🛰️  Daemon monitoring {len(self.streams)} streams on {self.workers} workers")
+        for stream in self.streams:
+            stream.log_event("Monitoring started", 'monitor_start')
+        self.running = True
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+        next_report = time.time() + self.report_interval
+        try:
+            while self.running:
+                self._dispatch(time.time())
+                if all(stream.finished for stream in self.streams) and not self.in_flight:
+                    print("🎞️  All streams finished")
+                    break
+                try:
+                    self._finish(*self._done.get(timeout=0.01))
+                    while True:
+                        self._finish(*self._done.get_nowait())
+                except queue.Empty:
+                    pass
+                if time.time() >= next_report:
+                    next_report = time.time() + self.report_interval
+                    self.report()
+        except KeyboardInterrupt:
+            print("\n🛑 Daemon stopped by user")
+        finally:
+            self.pool.shutdown(wait=True)
+            for stream in self.streams:
+                stream.actions.drain()
+                stream.camera.release()
+                stream.log_event("Monitoring stopped", 'monitor_stop')
+            self.report()
+            if self.logger is not None:
+                self.logger.close()
+
+
+def run_daemon(config_file, settings_manager):
+    """Load a streams config and monitor every stream headless until stopped"""
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+    if not config.get("streams"):
+        print(f"❌ No streams configured in {config_file}")
+        return
+    try:
+        daemon = MonitorDaemon(settings_manager, config)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    daemon.run()
+    if daemon.failure is not None:
+        sys.exit(1)
+
+
+def show_live_stats(stats_file="timetrap_stats.json"):
+    """Print the stats exported by a running monitor, refreshing on ENTER"""
+    while True:
+        if not os.path.exists(stats_file):
+            print("\n⚠️  No stats found. Start monitoring with stats enabled first.")
+            time.sleep(2)
+            return
+        with open(stats_file, 'r') as f:
+            stats = json.load(f)
+        
+        print("\n" + "="*60)
+        print("LIVE STATS")
+        print("="*60)
+        age = time.time() - os.path.getmtime(stats_file)
+        print(f"🕒 Updated {stats['timestamp']} ({age:.0f}s ago), "
+              f"uptime {stats['uptime_seconds'] / 60:.1f} min")
+        print(f"🔁 Loop rate: {stats['loop_rate']:.2f} checks/s\n")
+        for name, value in sorted(stats['counters'].items()):
+            print(f"   {name:<24}{value:>12}")
+        for name, gauge in sorted(stats.get('series', {}).items()):
+            for key, value in sorted(gauge['values'].items()):
+                print(f"   {f'{name}[{key}]':<24}{value:>12}")
+        print(f"\n   {'stage':<12}{'count':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+        for name, stage in sorted(stats['stages'].items()):
+            print(f"   {name:<12}{stage['count']:>10}{stage['p50_ms']:>10.2f}"
+                  f"{stage['p90_ms']:>10.2f}{stage['p99_ms']:>10.2f}")
+        print("="*60)
+        if input("\nPress ENTER to refresh or q to return... ").strip().lower() == 'q':
+            return
+
+
+def show_activity_log(log_file="timetrap_activity.log", page_size=20):
+    """Page through, filter or tail the activity log"""
+    viewer = LogViewer(log_file)
+    if not viewer.files():
+        print("\n⚠️  No activity log found. Enable logging in settings.")
+        time.sleep(2)
+        return
+    
+    print("\n" + "="*60)
+    print("ACTIVITY LOG")
+    print("="*60)
+    print("Leave filters blank to show everything.")
+    event_filter = input("Event types (e.g. lock,unauthorized) or 'tail' to follow: ").strip()
+    
+    if event_filter.lower() == 'tail':
+        print("\n👀 Following the log - press Ctrl+C to stop\n")
+        try:
+            for record in viewer.tail(page_size):
+                print(LogViewer.format(record))
+        except KeyboardInterrupt:
+            print()
+        return
+    
+    events = [e.strip() for e in event_filter.split(',') if e.strip()] or None
+    start = input("From date (YYYY-MM-DD): ").strip() or None
+    end = input("To date (YYYY-MM-DD): ").strip() or None
+    print()
+    
+    shown = 0
+    for page in viewer.pages(page_size, start=start, end=end, events=events):
+        for record in page:
+            print(LogViewer.format(record))
+        shown += len(page)
+        if len(page) == page_size and \
+                input(f"\n-- {shown} shown - ENTER for more, q to quit -- ").strip().lower() == 'q':
+            return
+    print("\n" + "="*60)
+    print(f"{shown} events")
+    input("\nPress ENTER to continue...")
+
+
+def replay_incident(path, zoom=4):
+    """Step back and forth through the checks saved in an incident file"""
+    with np.load(path) as data:
+        incident = {name: data[name] for name in data.files}
+    metadata = json.loads(str(incident["metadata"]))
+    stages, statuses, paths = metadata["stages"], metadata["statuses"], metadata["paths"]
+    timestamps = incident["timestamps"]
+    checks = len(timestamps)
+    if checks == 0:
+        print("⚠️  The incident file holds no checks")
+        return
+    end = timestamps[-1]
+    
+    print("\n" + "="*60)
+    print(f"INCIDENT - {metadata['reason'].upper()} LOCK")
+    print("="*60)
+    print(f"🕒 Saved {metadata['saved']}, {checks} checks over {end - timestamps[0]:.1f}s")
+    print(f"⚙️  Tolerance {metadata['tolerance']}, lock delay {metadata['lock_delay']}s")
+    print(f"\n{'#':>4}{'t':>9}  {'path':<10}{'verdict':<14}{'faces':>6}{'best':>8}{'ms':>9}")
+    for i in range(checks):
+        distances = incident["distances"][i]
+        best = np.nanmin(distances) if np.isfinite(distances).any() else None
+        # 'confirm' wraps encode and match calls that are already counted
+        total = np.nansum([ms for name, ms in zip(stages, incident["timings"][i])
+                           if name != 'confirm'])
+        print(f"{i:>4}{timestamps[i] - end:>8.2f}s  {paths[incident['check_paths'][i]]:<10}"
+              f"{statuses[incident['statuses'][i]]:<14}{incident['face_counts'][i]:>6}"
+              f"{'-' if best is None else f'{best:.3f}':>8}{total:>9.1f}")
+    
+    show_images, window_open = True, False
+    i = checks - 1
+    while True:
+        print(f"\n#{i}  t={timestamps[i] - end:+.2f}s  {statuses[incident['statuses'][i]]} "
+              f"via {paths[incident['check_paths'][i]]}")
+        shown_faces = min(int(incident["face_counts"][i]), len(incident["boxes"][i]))
+        for box, distance in zip(incident["boxes"][i][:shown_faces], incident["distances"][i]):
+            print(f"   face {tuple(int(v) for v in box)}"
+                  f"{'' if np.isnan(distance) else f'  distance {distance:.3f}'}")
+        timings = [f"{name} {ms:.1f}" for name, ms in zip(stages, incident["timings"][i])
+                   if not np.isnan(ms)]
+        if timings:
+            print(f"   ms: {', '.join(timings)}")
+        
+        height, width = incident["frame_sizes"][i]
+        if show_images and height:
+            thumb = incident["thumbs"][i]
+            image = cv2.resize(thumb, None, fx=zoom, fy=zoom, interpolation=cv2.INTER_NEAREST)
+            sx, sy = image.shape[1] / width, image.shape[0] / height
+            for top, right, bottom, left in incident["boxes"][i][:shown_faces]:
+                cv2.rectangle(image, (int(left * sx), int(top * sy)),
+                              (int(right * sx), int(bottom * sy)), (0, 0, 255), 2)
+            try:
+                cv2.imshow('Time Trap - Incident', image)
+                cv2.waitKey(1)
+                window_open = True
+            except cv2.error:
+                print("   (no display available - thumbnails are not shown)")
+                show_images = False
+        
+        command = input("ENTER/n next, b back, a number to jump, q quit: ").strip().lower()
+        if command == 'q':
+            break
+        if command == 'b':
+            i = max(0, i - 1)
+        elif command.isdigit():
+            i = min(checks - 1, int(command))
+        else:
+            i = min(checks - 1, i + 1)
+    if window_open:
+        cv2.destroyAllWindows()
+
+
+def main():
+
+    """Main entry point"""
+    print("="*60)
+    print("TIME TRAP - STARTUP")
+    print("="*60)
+    
+    parser = argparse.ArgumentParser(description="Time Trap - Smart PC Lock System")
+    parser.add_argument("--source",
+                        help="Camera index, video file, image folder or 'synthetic[:frames]'")
+    parser.add_argument("--daemon", metavar="STREAMS_JSON",
+                        help="Monitor the streams listed in this file headless, without the menu")
+    parser.add_argument("--replay-incident", metavar="FILE",
+                        help="Step through the checks saved in an incident file")
+    args = parser.parse_args()
+    
+    if args.replay_incident:
+        replay_incident(args.replay_incident)
+        return
+    
+    # Load settings
+    settings_manager = TimeTrapSettings()
+    if args.source is not None:
+        # Override for this session only, e.g. to replay recorded footage headless
+        settings_manager.settings["frame_source"] = args.source
+    if args.daemon:
+        run_daemon(args.daemon, settings_manager)
+        return
+    
+    # Load the detector and encoder while the menu waits for input
+    warmup = None
+    if settings_manager.settings["model_warmup"]:
+        warmup = ModelWarmup(settings_manager.settings["detector_model"]).start()
+    print(f"⏱️  Menu ready in {time.perf_counter() - _PROCESS_STARTED:.2f}s")
+    
+    print("\n1. Start Monitoring")
+    print("2. Register / Re-register Face")
+    print("3. View Activity Log")
+    print("4. View Live Stats")
+    print("5. Exit")
+    
+    choice = input("\nSelect option (1-5): ").strip()
+    
+   
+    if choice == "2":
+        # Force re-registration
+        if warmup is not None:
+            print(warmup.report(warmup.wait()))
+        time_trap = TimeTrap(settings_manager)
+        time_trap.setup_authorized_user()
+        return
+    elif choice == "3":
+        # View activity log
+        show_activity_log()
+        return
+    elif choice == "4":
+        show_live_stats(settings_manager.settings["stats_file"] + ".json")
+        return
+    elif choice == "5":
+        print("👋 Goodbye!")
+        return
+    
+    if warmup is not None:
+        print(warmup.report(warmup.wait()))
     
     # Start monitoring
     time_trap = TimeTrap(settings_manager)
@@ -0,0 +1,293 @@
+"""
+TimeTrap – Parameter sweep over recorded sessions
+Author: Anupom Kumar Ghosh
+Copyright © 2025 Anupom Kumar Ghosh
+
+Replays sessions recorded with "record_sessions" enabled through the same
+absent/authorized/unauthorized lock rules as TimeTrap.run, for thousands of
+tolerance / lock_delay / check_interval combinations at once, and reports
+for each combination:
+
+- false locks per hour while the authorized user was present
+- the share of intruder episodes that never triggered a lock
+- the mean time from the user leaving to the lock
+
+Ground truth comes from a labels file when one is given. Otherwise it is
+inferred from the recording itself: no face means absent, a face well
+inside --user-distance means the user, a face beyond --intruder-distance
+means an intruder, and anything in between is left out.
+
+Usage:
+    python3 sweep.py sessions/ --tolerance 0.35:0.75:0.01 --lock-delay 10:120:5
+    python3 sweep.py sessions/ --labels labels.json --output sweep.csv
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from main import GALLERY_FILE, FaceGallery, LockStateMachine
+
+ABSENT, USER, INTRUDER, UNKNOWN = 0, 1, 2, 3
+TRUTH_NAMES = {"absent": ABSENT, "user": USER, "intruder": INTRUDER}
+
+
+def parse_values(spec):
+    """'start:stop:step' (inclusive) or a comma-separated list"""
+    if ':' in spec:
+        start, stop, step = (float(part) for part in spec.split(':'))
+        return np.round(np.arange(start, stop + step / 2, step), 6)
+    return np.array([float(value) for value in spec.split(',')])
+
+
+def load_sessions(paths):
+    """Load recorded sessions, joining the parts of each one in order"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, '*.npz')))
+        else:
+            files.append(path)
+
+    grouped = {}
+    for path in sorted(files):
+        grouped.setdefault(re.sub(r'_part\d+\.npz$', '', path), []).append(path)
+
+    sessions = []
+    for name, parts in grouped.items():
+        timestamps, face_counts, offsets, embeddings = [], [], [], []
+        total = 0
+        for part in parts:
+            with np.load(part) as data:
+                timestamps.append(data["timestamps"])
+                face_counts.append(data["face_counts"])
+                offsets.append(data["offsets"][:-1] + total)
+                embeddings.append(data["embeddings"])
+                total += len(data["embeddings"])
+        sessions.append({
+            "name": os.path.basename(name),
+            "timestamps": np.concatenate(timestamps),
+            "face_counts": np.concatenate(face_counts),
+            "offsets": np.append(np.concatenate(offsets), total),
+            "embeddings": np.concatenate(embeddings).astype(np.float32),
+        })
+    return sessions
+
+
+def best_distances(session, gallery):
+    """Distance of the closest enrolled face for every check (inf if none was encoded)"""
+    checks = len(session["timestamps"])
+    result = np.full(checks, np.inf, dtype=np.float32)
+    if len(session["embeddings"]) == 0:
+        return result
+    # One batched match for the whole session, then a min per check
+    _, distances = gallery.match(session["embeddings"])
+    starts, ends = session["offsets"][:-1], session["offsets"][1:]
+    encoded = ends > starts
+    result[encoded] = np.minimum.reduceat(distances, starts[encoded])
+    return result
+
+
+def ground_truth(session, distances, labels, user_distance, intruder_distance):
+    """Truth code per check from labels, falling back to the recording itself"""
+    truth = np.full(len(distances), UNKNOWN, dtype=np.int8)
+    truth[distances <= user_distance] = USER
+    truth[(distances >= intruder_distance) & np.isfinite(distances)] = INTRUDER
+    truth[session["face_counts"] == 0] = ABSENT
+    for label in labels or []:
+        inside = ((session["timestamps"] >= label["start"]) &
+                  (session["timestamps"] <= label["end"]))
+        truth[inside] = TRUTH_NAMES[label["label"]]
+    return truth
+
+
+def sweep_session(session, distances, truth, tolerance, lock_delay, check_interval):
+    """
+    Replay one session for every combination at once
+
+    tolerance, lock_delay and check_interval are equal-length arrays, one
+    entry per combination. The state update mirrors LockStateMachine.step,
+    applied to all combinations sampled at each recorded check.
+    """
+    combos = len(tolerance)
+    absent_since = np.full(combos, np.nan)
+    next_sample = np.full(combos, -np.inf)
+    episode_locked = np.zeros(combos, dtype=bool)
+    totals = {key: np.zeros(combos) for key in (
+        "locks", "false_locks", "missed_intruders", "absence_locked", "time_to_lock_sum")}
+    counts = {"intruder_episodes": 0, "absence_episodes": 0, "user_seconds": 0.0}
+
+    timestamps, face_counts = session["timestamps"], session["face_counts"]
+    previous_truth, episode_start = None, 0.0
+
+    def close_episode():
+        if previous_truth == INTRUDER:
+            counts["intruder_episodes"] += 1
+            totals["missed_intruders"] += ~episode_locked
+        elif previous_truth == ABSENT:
+            counts["absence_episodes"] += 1
+
+    for c in range(len(timestamps)):
+        now = timestamps[c]
+        if c + 1 < len(timestamps) and truth[c] == USER:
+            counts["user_seconds"] += timestamps[c + 1] - now
+        if truth[c] != previous_truth:
+            close_episode()
+            previous_truth, episode_start = truth[c], now
+            episode_locked[:] = False
+
+        # Only combinations whose check interval has elapsed look at this check
+        active = now >= next_sample
+        next_sample[active] = now + check_interval[active]
+
+        if face_counts[c] == 0:
+            waiting = np.isnan(absent_since)
+            lock = active & ~waiting & (now - absent_since >= lock_delay)
+            absent_since[active & waiting] = now
+            absent_since[lock] = np.nan
+        else:
+            lock = active & (distances[c] > tolerance)
+            absent_since[active] = np.nan
+
+        if lock.any():
+            totals["locks"] += lock
+            if truth[c] == USER:
+                totals["false_locks"] += lock
+            elif truth[c] == ABSENT:
+                first = lock & ~episode_locked
+                totals["absence_locked"] += first
+                totals["time_to_lock_sum"] += np.where(first, now - episode_start, 0.0)
+            episode_locked |= lock
+    close_episode()
+    return totals, counts
+
+
+def replay_single(session, distances, tolerance, lock_delay, check_interval):
+    """Scalar replay through LockStateMachine itself, to cross-check the sweep"""
+    machine = LockStateMachine(lock_delay)
+    next_sample, locks = -np.inf, 0
+    for now, faces, distance in zip(session["timestamps"], session["face_counts"], distances):
+        if now < next_sample:
+            continue
+        next_sample = now + check_interval
+        if faces == 0:
+            status = 'absent'
+        else:
+            status = 'authorized' if distance <= tolerance else 'unauthorized'
+        if machine.step(status, now) in ('lock_absent', 'lock_unauthorized'):
+            locks += 1
+    return locks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep Time Trap parameters over recorded sessions")
+    parser.add_argument("sessions", nargs="+", help="Session .npz files or folders of them")
+    parser.add_argument("--gallery", default=GALLERY_FILE,
+                        help="Authorized gallery file (template store)")
+    parser.add_argument("--tolerance", default="0.35:0.75:0.01")
+    parser.add_argument("--lock-delay", default="10:120:5")
+    parser.add_argument("--check-interval", default="0.1,0.25,0.5,1,2")
+    parser.add_argument("--labels", help="JSON list of {start, end, label: user|absent|intruder}")
+    parser.add_argument("--user-distance", type=float, default=0.45,
+                        help="Without labels, faces at most this far count as the user")
+    parser.add_argument("--intruder-distance", type=float, default=0.7,
+                        help="Without labels, faces at least this far count as intruders")
+    parser.add_argument("--top", type=int, default=15, help="Rows to print")
+    parser.add_argument("--output", help="Write every combination to a .csv or .json file")
+    parser.add_argument("--verify", action="store_true",
+                        help="Cross-check the first combination against LockStateMachine")
+    args = parser.parse_args()
+
+    gallery = FaceGallery()
+    try:
+        gallery.load(args.gallery)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ {e}")
+    sessions = load_sessions(args.sessions)
+    if not sessions:
+        raise SystemExit("❌ No recorded sessions found")
+    labels = None
+    if args.labels:
+        with open(args.labels) as f:
+            labels = json.load(f)
+
+    grid = np.meshgrid(parse_values(args.tolerance), parse_values(args.lock_delay),
+                       parse_values(args.check_interval), indexing='ij')
+    tolerance, lock_delay, check_interval = (axis.ravel() for axis in grid)
+    print(f"🧮 {len(tolerance)} combinations × "
+          f"{sum(len(s['timestamps']) for s in sessions)} recorded checks "
+          f"from {len(sessions)} session(s)")
+
+    started = time.perf_counter()
+    totals, counts = None, None
+    for session in sessions:
+        distances = best_distances(session, gallery)
+        truth = ground_truth(session, distances, labels, args.user_distance, args.intruder_distance)
+        session_totals, session_counts = sweep_session(session, distances, truth, tolerance,
+                                                       lock_delay, check_interval)
+        if args.verify:
+            expected = replay_single(session, distances, tolerance[0], lock_delay[0],
+                                     check_interval[0])
+            status = "✅" if expected == session_totals["locks"][0] else "❌"
+            print(f"{status} {session['name']}: state machine {expected} locks, "
+                  f"sweep {int(session_totals['locks'][0])}")
+        if totals is None:
+            totals, counts = session_totals, session_counts
+        else:
+            for key in totals:
+                totals[key] += session_totals[key]
+            for key in counts:
+                counts[key] += session_counts[key]
+    elapsed = time.perf_counter() - started
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        user_hours = counts["user_seconds"] / 3600.0
+        results = {
+            "tolerance": tolerance,
+            "lock_delay": lock_delay,
+            "check_interval": check_interval,
+            "false_locks_per_hour": totals["false_locks"] / user_hours if user_hours else
+            np.zeros(len(tolerance)),
+            "missed_intruder_rate": totals["missed_intruders"] / counts["intruder_episodes"]
+            if counts["intruder_episodes"] else np.zeros(len(tolerance)),
+            "mean_time_to_lock": totals["time_to_lock_sum"] / totals["absence_locked"],
+            "absences_locked": totals["absence_locked"] / counts["absence_episodes"]
+            if counts["absence_episodes"] else np.zeros(len(tolerance)),
+            "locks": totals["locks"],
+        }
+
+    # Safest first: fewest missed intruders, then fewest false locks, then fastest lock
+    order = np.lexsort((np.nan_to_num(results["mean_time_to_lock"], nan=np.inf),
+                        results["false_locks_per_hour"], results["missed_intruder_rate"]))
+    print(f"⚡ Swept in {elapsed:.2f}s  |  {counts['user_seconds'] / 3600:.2f}h with user present, "
+          f"{counts['intruder_episodes']} intruder and {counts['absence_episodes']} absence episodes\n")
+    print(f"{'tolerance':>10}{'delay':>8}{'interval':>10}{'false/h':>10}"
+          f"{'missed':>9}{'to lock':>10}{'locked':>9}")
+    for i in order[:args.top]:
+        time_to_lock = results["mean_time_to_lock"][i]
+        print(f"{tolerance[i]:>10.2f}{lock_delay[i]:>8.0f}{check_interval[i]:>10.2f}"
+              f"{results['false_locks_per_hour'][i]:>10.2f}"
+              f"{results['missed_intruder_rate'][i]:>9.0%}"
+              f"{'n/a' if np.isnan(time_to_lock) else f'{time_to_lock:.1f}s':>10}"
+              f"{results['absences_locked'][i]:>9.0%}")
+
+    if args.output:
+        rows = [{key: float(values[i]) for key, values in results.items()} for i in order]
+        with open(args.output, 'w', newline='') as f:
+            if args.output.endswith('.json'):
+                json.dump(rows, f, indent=2)
+            else:
+                writer = csv.DictWriter(f, fieldnames=list(results))
+                writer.writeheader()
+                writer.writerows(rows)
+        print(f"\n💾 {len(rows)} combinations written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()